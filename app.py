@@ -1,12 +1,12 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import yfinance as yf
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 import pandas as pd
 import pytz
 from mongo_client import mongo
 from routes.top_gainers import top_gainers_api
 from routes.live_gainers import live_gainers_api
+from routes.live_stream import live_stream_api
 from routes.display_chart import display_chart_api
 from routes.data_handler import data_handler_api
 from routes.mongo_export import mongo_export
@@ -17,10 +17,23 @@ from routes.model_trainer import model_trainer_api
 from routes.auth import init_auth
 from routes.notifier import notifier,init_notifier_jwt
 from stock_utility import StockUtility
+from market_calendar import get_market_calendar
+import ohlcv_cache
+import ohlcv_response
+import response_formats
+import single_flight
+import ticker_meta
+import top_gainers_snapshot
+import latest_summary
+import index_manager
+import threading
+import hashlib
+import json
 import yaml
 import os
 
 stock_util = StockUtility()
+market_calendar = get_market_calendar()
 
 
 with open("/shared/mongo.yaml", "r") as f:
@@ -39,6 +52,7 @@ mongo.init_app(app)
 init_auth(app)
 app.register_blueprint(top_gainers_api)
 app.register_blueprint(live_gainers_api)
+app.register_blueprint(live_stream_api)
 app.register_blueprint(display_chart_api)
 app.register_blueprint(data_handler_api)
 app.register_blueprint(mongo_export)
@@ -48,6 +62,10 @@ app.register_blueprint(config_update_api)
 app.register_blueprint(model_trainer_api)
 
 init_notifier_jwt(app)
+index_manager.start_reconciler()
+ticker_meta.start_refresher()
+top_gainers_snapshot.start_maintainer()
+latest_summary.start_poller()
 app.register_blueprint(notifier)
 CORS(app)
 
@@ -63,19 +81,66 @@ def get_stocks_list():
     """
     return stock_util.get_stock_symbols_json()
 
-@app.route('/api/market_update', methods=['GET'])
-def get_market_update():
+MARKET_OPEN_TIME = time(9, 15)
+MARKET_CLOSE_TIME = time(15, 30)
+
+# Pre-serialized /api/market_update payload, valid until the next session boundary
+_market_update_cache = {"expires_at": None, "holidays": None, "body": None, "etag": None}
+_market_update_lock = threading.Lock()
+
+def next_session_boundary(now_ist):
+    """Next point at which the market_update answer can change: 09:15, 15:30 or midnight IST."""
     ist = pytz.timezone("Asia/Kolkata")
-    now_ist = datetime.now(ist)
+    today = now_ist.date()
+    for boundary_time in (MARKET_OPEN_TIME, MARKET_CLOSE_TIME):
+        boundary = ist.localize(datetime.combine(today, boundary_time))
+        if now_ist <= boundary:
+            return boundary
+    return ist.localize(datetime.combine(today + timedelta(days=1), time.min))
+
+def build_market_update(now_ist):
+    """Compute the market_update payload (without server_time_ist) and its ETag."""
     is_open = stock_util.is_market_live(now_ist)
     last_trading_day = stock_util.get_last_trading_day(now_ist)
     next_open_time = stock_util.get_next_trading_day(now_ist)
-    return jsonify({
+    payload = {
         "is_market_open": is_open,
-        "server_time_ist": now_ist.strftime("%Y-%m-%d %H:%M:%S"),
         "next_market_open": format_datetime(next_open_time, "%Y-%m-%d %H:%M:%S") if next_open_time else None,
         "last_trading_day": format_datetime(last_trading_day, "%Y-%m-%d") if last_trading_day else None
-    })
+    }
+    body = json.dumps(payload, separators=(",", ":"))
+    etag = hashlib.md5(body.encode("utf-8")).hexdigest()
+    # Keep the body open so server_time_ist can be appended per request
+    return body[:-1], etag
+
+@app.route('/api/market_update', methods=['GET'])
+def get_market_update():
+    ist = pytz.timezone("Asia/Kolkata")
+    now_ist = datetime.now(ist)
+    holidays = market_calendar.holidays
+
+    cache = _market_update_cache
+    # Body and ETag are written and read as one pair
+    with _market_update_lock:
+        if cache["expires_at"] is None or now_ist >= cache["expires_at"] or cache["holidays"] is not holidays:
+            body, etag = build_market_update(now_ist)
+            cache.update({
+                "body": body,
+                "etag": etag,
+                "holidays": holidays,
+                "expires_at": next_session_boundary(now_ist)
+            })
+        body, etag = cache["body"], cache["etag"]
+
+    # Weak ETag: the sent body also carries a per-request server_time_ist
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        server_time = now_ist.strftime("%Y-%m-%d %H:%M:%S")
+        response = Response(f'{body},"server_time_ist":"{server_time}"}}', mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.route('/api/stock', methods=['GET'])
 def get_stock_data():
@@ -84,31 +149,23 @@ def get_stock_data():
     start = request.args.get('start')
     end = request.args.get('end')
     period = request.args.get('period')
+    output_format = response_formats.negotiate_format()
 
     if not symbol:
         return jsonify({'error': 'Symbol is required'}), 400
+    if output_format is None:
+        return response_formats.unknown_format_error()
 
     try:
-        stock = yf.Ticker(symbol)
-
         if start and end:
             # Handle same-day case by adding 1 day
             if start == end:
                 end_dt = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)
                 end = end_dt.strftime("%Y-%m-%d")
 
-            data = stock.history(
-                start=start,
-                end=end,
-                interval=interval,
-                auto_adjust=False
-            )
+            data = ohlcv_cache.get_history(symbol, interval, start=start, end=end)
         elif period:
-            data = stock.history(
-                period=period,
-                interval=interval,
-                auto_adjust=False
-            )
+            data = ohlcv_cache.get_history(symbol, interval, period=period)
         else:
             return jsonify({'error': 'Either start/end or period must be provided'}), 400
 
@@ -123,24 +180,88 @@ def get_stock_data():
         if "Date" not in data.columns:
             return jsonify({'error': 'No date information in stock data'}), 500
 
-        result = [
-            {
-                "Date": row["Date"].strftime("%Y-%m-%d"),
-                "Open": round(row["Open"], 2),
-                "High": round(row["High"], 2),
-                "Low": round(row["Low"], 2),
-                "Close": round(row["Close"], 2),
-                "Volume": int(row["Volume"])
-            }
-            for _, row in data.iterrows()
-        ]
+        if output_format == "rows":
+            return jsonify(ohlcv_response.build_rows(data))
 
-        return jsonify(result)
+        # columns, msgpack and arrow all carry the struct-of-arrays form
+        columns = ohlcv_response.build_columns(data)
+        return response_formats.make_response(output_format, columns, table=columns)
 
     except Exception as e:
         print("Error fetching stock data:", str(e))
         return jsonify({'error': str(e)}), 500
     
+MAX_BATCH_SYMBOLS = 100
+
+@app.route('/api/stocks/batch', methods=['GET', 'POST'])
+def get_stocks_batch():
+    """
+    History for several symbols in one request, each payload shaped like /api/stock.
+    GET:  ?symbols=A.NS,B.NS&start=...&end=...|period=...&interval=...&format=rows|columns
+    POST: {"symbols": [...], "start": ..., "end": ..., "period": ..., "interval": ..., "format": ...}
+    Per-symbol failures are reported under "errors" without failing the batch.
+    """
+    if request.method == 'POST':
+        params = request.get_json(silent=True) or {}
+        if not isinstance(params, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+    else:
+        params = request.args
+    symbols = params.get('symbols') or []
+    if isinstance(symbols, str):
+        symbols = [s for s in symbols.split(",") if s.strip()]
+    if not isinstance(symbols, list) or not all(isinstance(s, str) and s.strip() for s in symbols):
+        return jsonify({'error': 'symbols must be a list of non-empty strings'}), 400
+    # Upper-cased: yf.download names its columns by the upper-case ticker
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    interval = params.get('interval', '1d')
+    start = params.get('start')
+    end = params.get('end')
+    period = params.get('period')
+    output_format = params.get('format', 'rows')
+
+    if not symbols:
+        return jsonify({'error': 'symbols is required'}), 400
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_BATCH_SYMBOLS} symbols per batch'}), 400
+    if not (start and end) and not period:
+        return jsonify({'error': 'Either start/end or period must be provided'}), 400
+
+    try:
+        if start and end and start == end:
+            # Handle same-day case by adding 1 day
+            end = (datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        frames, errors = ohlcv_cache.download_history_batch(symbols, interval, start=start, end=end, period=period)
+    except Exception as e:
+        print("Error fetching batch stock data:", str(e))
+        return jsonify({'error': str(e)}), 500
+
+    results = {}
+    for symbol, data in frames.items():
+        try:
+            if not isinstance(data.index, pd.DatetimeIndex):
+                data.index = pd.to_datetime(data.index, errors='coerce')
+            data = data.reset_index()
+            if "Date" not in data.columns:
+                errors[symbol] = 'No date information in stock data'
+                continue
+            if output_format == "columns":
+                results[symbol] = ohlcv_response.build_columns(data)
+            else:
+                results[symbol] = ohlcv_response.build_rows(data)
+        except Exception as e:
+            errors[symbol] = str(e)
+
+    return jsonify({"data": results, "errors": errors})
+
+@app.route('/api/upstream_stats', methods=['GET'])
+def get_upstream_stats():
+    """
+    Request-coalescing counters for upstream (yfinance) calls.
+    """
+    return jsonify(single_flight.all_stats())
+
 @app.route('/api/test_alive', methods=['GET'])
 def test_alive():
     """
@@ -0,0 +1,133 @@
+"""
+Benchmark for /api/display_chart over a multi-day range: the original four
+sequential, unprojected find() calls vs the parallel projected reads.
+
+Seeds a scratch database on the given server (dropped and recreated on every run)
+with one stock of 1-minute intraday bars carrying indicator fields, then times
+the endpoint end to end through the Flask test client:
+
+    BENCH_MONGO_URI=mongodb://localhost:27017/ python benchmarks/bench_display_chart.py [days]
+
+BENCH_MONGO_URI=mongomock:// runs against an in-process mongomock database instead;
+that measures only the Python-side cost (decoding, copying, serialization), with no
+network round trips for the parallel reads to overlap.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import datetime
+from pymongo import MongoClient, ASCENDING
+from flask import Flask
+
+BENCH_DB = "gibsi_bench_display_chart"
+STOCK_ID, TICKER = 1, "BENCH.NS"
+
+# display_chart resolves tickers from the stock list at import time
+_stocks_file = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+_stocks_file.write(f"ID,Name,Ticker\n{STOCK_ID},Bench,{TICKER}\n")
+_stocks_file.close()
+os.environ["STOCKS_LIST_FILE"] = _stocks_file.name
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import routes.display_chart as display_chart
+
+
+def indicators(rng):
+    return {f"ind_{i}": rng.uniform(-100, 100) for i in range(30)}
+
+
+def seed(db, days):
+    for name in ("historical", "intraday", "periodic_summary", "open_positions"):
+        db[name].drop()
+    rng = random.Random(7)
+    base = datetime.datetime(2025, 1, 6, 3, 45)
+    price = 1000.0
+    intraday, summaries, daily, positions = [], [], [], []
+    for d in range(days):
+        day = base + datetime.timedelta(days=d)
+        open_price = price
+        for m in range(375):
+            price *= rng.uniform(0.999, 1.001)
+            dt = day + datetime.timedelta(minutes=m)
+            bar = {"stock_id": STOCK_ID, "ticker": TICKER, "Datetime": dt,
+                   "Open": price, "High": price * 1.001, "Low": price * 0.999, "Close": price,
+                   "Volume": rng.randint(100, 10_000), **indicators(rng)}
+            intraday.append(bar)
+            summaries.append({"stock_id": STOCK_ID, "ticker": TICKER, "Datetime": dt, "Close": price,
+                              "signal": rng.choice(["BUY", "SELL", "HOLD"]), "score": rng.random(),
+                              "reasons": [f"reason {i}" for i in range(10)], **indicators(rng)})
+        daily.append({"stock_id": STOCK_ID, "ticker": TICKER, "Datetime": day, "Open": open_price,
+                      "High": price * 1.01, "Low": price * 0.99, "Close": price, "Volume": 1_000_000,
+                      **indicators(rng)})
+        positions.append({"stock_id": STOCK_ID, "ticker": TICKER, "Datetime": day,
+                          "buy_time": day, "buy_price": open_price, "sell_time": day + datetime.timedelta(hours=5),
+                          "sell_price": price, "profit_pct": (price - open_price) / open_price * 100,
+                          "signal": "CLOSED", "reasons": [f"reason {i}" for i in range(10)]})
+    db["intraday"].insert_many(intraday)
+    db["periodic_summary"].insert_many(summaries)
+    db["historical"].insert_many(daily)
+    db["open_positions"].insert_many(positions)
+    for name in ("historical", "intraday", "periodic_summary", "open_positions"):
+        db[name].create_index([("stock_id", ASCENDING), ("ticker", ASCENDING), ("Datetime", ASCENDING)])
+    return base, base + datetime.timedelta(days=days - 1)
+
+
+def mongo_client(uri):
+    if uri.startswith("mongomock://"):
+        import mongomock
+        return mongomock.MongoClient()
+    return MongoClient(uri)
+
+
+def sequential_unprojected(stock_id, ticker, start_utc, end_utc, resolution=None, since=None):
+    """The original access pattern: four sequential full-document reads."""
+    query = {"stock_id": int(stock_id), "ticker": ticker, "Datetime": {"$gte": start_utc, "$lte": end_utc}}
+    start_day_utc = start_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+    positions_query = {"stock_id": stock_id, "ticker": ticker, "Datetime": {"$gte": start_day_utc, "$lte": end_utc}}
+    return {
+        "historical": list(display_chart.db["historical"].find(query).sort("Datetime", 1)),
+        "intraday": list(display_chart.db["intraday"].find(query).sort("Datetime", 1)),
+        "periodic_summary": list(display_chart.db["periodic_summary"].find(query).sort("Datetime", 1)),
+        "open_positions": [{k: v for k, v in doc.items() if k != "_id"}
+                           for doc in display_chart.db["open_positions"].find(positions_query).sort("Datetime", 1)],
+    }
+
+
+def timed(name, client, url, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        # Time the Mongo reads, not the response cache
+        display_chart.chart_cache.clear()
+        t0 = time.perf_counter()
+        response = client.get(url)
+        best = min(best, time.perf_counter() - t0)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    print(f"{name:<36} {best * 1000:9.1f} ms  ({len(response.get_data()) / 1e6:.1f} MB)")
+    return best
+
+
+if __name__ == "__main__":
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    client = mongo_client(os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[BENCH_DB]
+    print(f"seeding {n_days} days of 1-minute bars ...")
+    start, end = seed(db, n_days)
+    display_chart.db = db
+
+    app = Flask(__name__)
+    app.register_blueprint(display_chart.display_chart_api)
+    http = app.test_client()
+    url = (f"/api/display_chart?stock_id={STOCK_ID}"
+           f"&start_date={start:%Y-%m-%d}&end_date={end:%Y-%m-%d}")
+
+    parallel = display_chart.fetch_chart_docs
+    display_chart.fetch_chart_docs = sequential_unprojected
+    old = timed("sequential, full documents", http, url)
+    display_chart.fetch_chart_docs = parallel
+    new = timed("parallel, projected", http, url)
+    print(f"speedup: {old / new:.2f}x")
+
+    client.drop_database(BENCH_DB)
+    os.unlink(_stocks_file.name)
@@ -0,0 +1,138 @@
+"""
+Micro-benchmark for the data browser serializers: the original per-document
+serialize_doc vs the compiled per-collection serializer, over intraday-shaped docs.
+
+    python benchmarks/bench_doc_serializer.py [docs]
+"""
+import os
+import sys
+import time
+import random
+import datetime
+from datetime import timezone, timedelta
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from doc_serializer import serialize_docs
+
+
+def serialize_doc_legacy(doc, db_name="intraday"):
+    """
+    The original per-document data_handler.serialize_doc, as the baseline.
+    Convert BSON doc -> JSON-serializable dict for frontend:
+    - convert datetime fields to IST strings
+    - convert _id to hex string under key '_id'
+    - remove internal keys (stock_id/type) if present
+    """
+    doc = dict(doc)  # copy
+    # Keep original _id as string for frontend (but don't keep BSON object)
+    oid = doc.get("_id")
+    if oid is not None:
+        try:
+            doc["_id"] = str(oid)
+        except Exception:
+            doc["_id"] = str(oid)
+
+    # Remove helper keys not intended for frontend
+    doc.pop("stock_id", None)
+    doc.pop("type", None)
+
+    # For user/login collections: convert created_at/last_login/login_time
+    if db_name in ("login", "user"):
+        for dt_field in ("created_at", "last_login", "login_time", "logout_time"):
+            dt = doc.get(dt_field)
+            if dt:
+                try:
+                    if hasattr(dt, "isoformat"):
+                        if dt.tzinfo is None:
+                            dt = dt.replace(tzinfo=timezone.utc)
+                        doc[dt_field] = dt.astimezone(timezone(timedelta(hours=5, minutes=30))).strftime("%Y-%m-%d %H:%M:%S")
+                    elif isinstance(dt, dict) and "$date" in dt:
+                        utc_dt = datetime.datetime.fromisoformat(dt["$date"].replace("Z", "+00:00"))
+                        doc[dt_field] = utc_dt.astimezone(timezone(timedelta(hours=5, minutes=30))).strftime("%Y-%m-%d %H:%M:%S")
+                    else:
+                        doc[dt_field] = str(dt)
+                except Exception:
+                    doc[dt_field] = str(dt)
+        # Remove Datetime if present (these collections use created_at / login_time)
+        doc.pop("Datetime", None)
+
+    else:
+        # For other collections, convert Datetime if present
+        dt = doc.get("Datetime")
+        if dt:
+            try:
+                # If it's a proper datetime
+                if hasattr(dt, "isoformat"):
+                    if dt.tzinfo is None:
+                        dt = dt.replace(tzinfo=timezone.utc)
+                    dt_ist = dt.astimezone(timezone(timedelta(hours=5, minutes=30)))
+                    if db_name in ("intraday", "periodic_summary"):
+                        # intraday / periodic: show time only for readability
+                        doc["Datetime"] = dt_ist.strftime("%H:%M:%S")
+                    else:
+                        doc["Datetime"] = dt_ist.strftime("%Y-%m-%d %H:%M:%S")
+                # If mongo-style {'$date': '...Z'}
+                elif isinstance(dt, dict) and "$date" in dt:
+                    utc_dt = datetime.datetime.fromisoformat(dt["$date"].replace("Z", "+00:00"))
+                    dt_ist = utc_dt.astimezone(timezone(timedelta(hours=5, minutes=30)))
+                    if db_name in ("intraday", "periodic_summary"):
+                        doc["Datetime"] = dt_ist.strftime("%H:%M:%S")
+                    else:
+                        doc["Datetime"] = dt_ist.strftime("%Y-%m-%d %H:%M:%S")
+                else:
+                    doc["Datetime"] = str(dt)
+            except Exception:
+                doc["Datetime"] = str(dt)
+
+    # Preferred ordering for frontend columns
+    default_orders = {
+        "intraday": ["Datetime", "ticker", "Open", "High", "Low", "Close", "Volume"],
+        "periodic_summary": ["Datetime", "ticker", "signal", "score", "reasons"],
+    }
+    preferred_keys = default_orders.get(db_name, [])
+
+    ordered_doc = {k: doc[k] for k in preferred_keys if k in doc}
+    for key in doc:
+        if key not in ordered_doc:
+            ordered_doc[key] = doc[key]
+
+    return ordered_doc
+
+
+def make_docs(n):
+    rng = random.Random(7)
+    base = datetime.datetime(2025, 1, 6, 3, 45)
+    docs = []
+    for i in range(n):
+        price = rng.uniform(100, 3000)
+        docs.append({
+            "_id": ObjectId(),
+            "stock_id": 1,
+            "ticker": "BENCH.NS",
+            "Datetime": base + datetime.timedelta(minutes=i),
+            "Open": price, "High": price * 1.01, "Low": price * 0.99, "Close": price,
+            "Volume": rng.randint(100, 100_000),
+            "RSI": rng.uniform(0, 100), "MACD": rng.uniform(-5, 5), "EMA_20": price,
+        })
+    return docs
+
+
+def timed(name, fn, n, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<30} {best * 1000:9.1f} ms  {n / best:12,.0f} docs/s")
+    return best
+
+
+if __name__ == "__main__":
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    docs = make_docs(n_docs)
+    assert [serialize_doc_legacy(d, "intraday") for d in docs] == serialize_docs(docs, "intraday")
+
+    old = timed("serialize_doc (per document)", lambda: [serialize_doc_legacy(d, "intraday") for d in docs], n_docs)
+    new = timed("serialize_docs (compiled)", lambda: serialize_docs(docs, "intraday"), n_docs)
+    print(f"speedup: {old / new:.1f}x")
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for the /api/stock response builders.
+Compares the original iterrows() path with the column-wise rows/columns builders.
+
+    python benchmarks/bench_stock_serialization.py [rows]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ohlcv_response import build_rows, build_columns
+
+
+def build_rows_iterrows(data):
+    """The original per-row /api/stock implementation, as the baseline."""
+    return [
+        {
+            "Date": row["Date"].strftime("%Y-%m-%d"),
+            "Open": round(row["Open"], 2),
+            "High": round(row["High"], 2),
+            "Low": round(row["Low"], 2),
+            "Close": round(row["Close"], 2),
+            "Volume": int(row["Volume"])
+        }
+        for _, row in data.iterrows()
+    ]
+
+
+def make_frame(rows):
+    rng = np.random.default_rng(7)
+    close = 100 + rng.standard_normal(rows).cumsum()
+    index = pd.date_range("2015-01-01 09:15", periods=rows, freq="min", tz="Asia/Kolkata", name="Date")
+    data = pd.DataFrame({
+        "Open": close + rng.random(rows),
+        "High": close + 1 + rng.random(rows),
+        "Low": close - 1 - rng.random(rows),
+        "Close": close,
+        "Adj Close": close,
+        "Volume": rng.integers(0, 1_000_000, rows).astype("float64"),
+    }, index=index)
+    return data.reset_index()
+
+
+def bench(name, fn, data, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<22} {best * 1000:9.1f} ms")
+    return best
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    data = make_frame(rows)
+    print(f"{rows} rows")
+    assert build_rows(data) == build_rows_iterrows(data)
+    base = bench("iterrows (original)", build_rows_iterrows, data, repeat=1)
+    fast = bench("column-wise rows", build_rows, data)
+    cols = bench("format=columns", build_columns, data)
+    print(f"speedup rows: {base / fast:.1f}x, columns: {base / cols:.1f}x")
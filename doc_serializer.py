@@ -0,0 +1,150 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+
+IST = timezone(timedelta(hours=5, minutes=30))
+IST_OFFSET = np.timedelta64(5 * 60 + 30, "m")
+
+FULL_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIME_FORMAT = "%H:%M:%S"
+
+# Fields never sent to the frontend
+DROPPED_FIELDS = ("stock_id", "type")
+# Timestamp fields of the user / login collections (these have no Datetime)
+ACCOUNT_COLLECTIONS = ("login", "user")
+ACCOUNT_DATETIME_FIELDS = ("created_at", "last_login", "login_time", "logout_time")
+# intraday / periodic: show time only for readability
+TIME_ONLY_COLLECTIONS = ("intraday", "periodic_summary")
+
+# Preferred ordering for frontend columns
+DEFAULT_ORDERS = {
+    "intraday": ["Datetime", "ticker", "Open", "High", "Low", "Close", "Volume"],
+    "periodic_summary": ["Datetime", "ticker", "signal", "score", "reasons"],
+}
+
+_PLAIN, _OBJECT_ID, _CONVERTED = 0, 1, 2
+
+
+def _format_value(dt, fmt):
+    """Per-value conversion (same rules as the original serialize_doc)."""
+    try:
+        if hasattr(dt, "isoformat"):
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.astimezone(IST).strftime(fmt)
+        if isinstance(dt, dict) and "$date" in dt:
+            utc_dt = datetime.fromisoformat(dt["$date"].replace("Z", "+00:00"))
+            return utc_dt.astimezone(IST).strftime(fmt)
+        return str(dt)
+    except Exception:
+        return str(dt)
+
+
+def format_datetimes(values, fmt):
+    """
+    IST strings for a column of values. datetime objects are formatted in one
+    vectorized pass; falsy values are kept as they are, anything else goes through
+    the per-value rules.
+    """
+    out = list(values)
+    positions, stamps = [], []
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            positions.append(i)
+            stamps.append(value)
+        else:
+            out[i] = _format_value(value, fmt)
+    if stamps:
+        try:
+            local = pd.DatetimeIndex(stamps).values + IST_OFFSET
+        except (pd.errors.OutOfBoundsDatetime, OverflowError, ValueError):
+            for i, value in zip(positions, stamps):
+                out[i] = _format_value(value, fmt)
+            return out
+        text = np.datetime_as_string(local, unit="s")
+        if fmt == TIME_FORMAT:
+            text = [t[11:] for t in text.tolist()]
+        else:
+            text = [t.replace("T", " ") for t in text.tolist()]
+        for i, t in zip(positions, text):
+            out[i] = t
+    return out
+
+
+class DocSerializer:
+    """
+    Serializer for one collection, compiled once: which datetime fields to format
+    (and how), which fields to drop, and the output key order per document shape.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        if db_name in ACCOUNT_COLLECTIONS:
+            self.datetime_fields = {f: FULL_FORMAT for f in ACCOUNT_DATETIME_FIELDS}
+            self.dropped = set(DROPPED_FIELDS) | {"Datetime"}
+        else:
+            self.datetime_fields = {"Datetime": TIME_FORMAT if db_name in TIME_ONLY_COLLECTIONS else FULL_FORMAT}
+            self.dropped = set(DROPPED_FIELDS)
+        self.preferred = DEFAULT_ORDERS.get(db_name, [])
+        self._templates = {}
+
+    def _template(self, keys):
+        """(key, kind) plan for documents with exactly these keys, in output order."""
+        template = self._templates.get(keys)
+        if template is None:
+            kept = [k for k in keys if k not in self.dropped]
+            ordered = [k for k in self.preferred if k in kept]
+            ordered += [k for k in kept if k not in ordered]
+            template = tuple(
+                (k, _OBJECT_ID if k == "_id" else _CONVERTED if k in self.datetime_fields else _PLAIN)
+                for k in ordered
+            )
+            self._templates[keys] = template
+        return template
+
+    def serialize_many(self, docs):
+        """Serialize a page of documents, formatting each datetime field column-wise."""
+        if not docs:
+            return []
+        converted = {
+            field: format_datetimes([doc.get(field) for doc in docs], fmt)
+            for field, fmt in self.datetime_fields.items()
+        }
+        out = []
+        for i, doc in enumerate(docs):
+            row = {}
+            for key, kind in self._template(tuple(doc)):
+                if kind == _PLAIN:
+                    row[key] = doc[key]
+                elif kind == _CONVERTED:
+                    row[key] = converted[key][i]
+                else:
+                    oid = doc[key]
+                    row[key] = str(oid) if oid is not None else None
+            out.append(row)
+        return out
+
+    def serialize(self, doc):
+        return self.serialize_many([doc])[0]
+
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+
+def get_serializer(db_name):
+    """Process-wide DocSerializer for a collection."""
+    serializer = _serializers.get(db_name)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.setdefault(db_name, DocSerializer(db_name))
+    return serializer
+
+
+def serialize_docs(docs, db_name="intraday"):
+    return get_serializer(db_name).serialize_many(docs)
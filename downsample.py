@@ -0,0 +1,151 @@
+import datetime
+import numpy as np
+
+# resolution= value -> ($dateTrunc unit, binSize, bucket length in ms)
+RESOLUTIONS = {
+    "5m": ("minute", 5, 5 * 60_000),
+    "15m": ("minute", 15, 15 * 60_000),
+    "30m": ("minute", 30, 30 * 60_000),
+    "1h": ("hour", 1, 3_600_000),
+    "1d": ("day", 1, 86_400_000),
+}
+# Raw bars, no bucketing
+RAW_RESOLUTIONS = {None, "", "1m", "raw"}
+
+# IST is a fixed UTC+05:30, so buckets can also be computed with epoch arithmetic
+IST_OFFSET_MS = 19_800_000
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def bucket_expr(resolution, use_date_trunc=True):
+    """
+    Aggregation expression for the start of the IST-aligned bucket holding $Datetime.
+    $dateTrunc needs MongoDB 5.0+; the fallback truncates epoch milliseconds.
+    """
+    unit, bin_size, length_ms = RESOLUTIONS[resolution]
+    if use_date_trunc:
+        return {"$dateTrunc": {"date": "$Datetime", "unit": unit, "binSize": bin_size, "timezone": "Asia/Kolkata"}}
+    # date - date = milliseconds, date - number = date
+    epoch_ms = {"$subtract": ["$Datetime", EPOCH]}
+    return {"$subtract": ["$Datetime", {"$mod": [{"$add": [epoch_ms, IST_OFFSET_MS]}, length_ms]}]}
+
+
+def bucket_start(dt, resolution):
+    """Start of the IST-aligned `resolution` bucket holding dt (same result as bucket_expr)."""
+    length = datetime.timedelta(milliseconds=RESOLUTIONS[resolution][2])
+    naive = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+    offset = (naive - EPOCH + datetime.timedelta(milliseconds=IST_OFFSET_MS)) % length
+    return dt - offset
+
+
+def ohlcv_bucket_pipeline(match, resolution, use_date_trunc=True):
+    """
+    Pipeline turning the bars matched by `match` into OHLCV bars of `resolution`:
+    first Open, max High, min Low, last Close, summed Volume, sorted by bucket start.
+    LastDatetime is the time of the newest raw bar in the bucket.
+    """
+    return [
+        {"$match": match},
+        {"$sort": {"Datetime": 1}},
+        {"$group": {
+            "_id": bucket_expr(resolution, use_date_trunc),
+            "Open": {"$first": "$Open"},
+            "High": {"$max": "$High"},
+            "Low": {"$min": "$Low"},
+            "Close": {"$last": "$Close"},
+            "Volume": {"$sum": "$Volume"},
+            "LastDatetime": {"$last": "$Datetime"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "Datetime": "$_id", "Open": 1, "High": 1, "Low": 1, "Close": 1, "Volume": 1,
+                      "LastDatetime": 1}},
+    ]
+
+
+def _epoch_seconds(values):
+    out = np.empty(len(values), dtype="float64")
+    for i, dt in enumerate(values):
+        if dt is None:
+            out[i] = np.nan
+        else:
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=datetime.timezone.utc)
+            out[i] = dt.timestamp()
+    return out
+
+
+def _fill_gaps(values):
+    """Linearly interpolate NaNs so every point can be scored; all-NaN becomes zeros."""
+    mask = np.isnan(values)
+    if not mask.any():
+        return values
+    if mask.all():
+        return np.zeros_like(values)
+    idx = np.arange(len(values))
+    values = values.copy()
+    values[mask] = np.interp(idx[mask], idx[~mask], values[~mask])
+    return values
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points of (x, y) that keep
+    the visual shape of the line. First and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold <= 2:
+        return np.array([0, n - 1])
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # threshold - 2 buckets over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def lttb(docs, threshold, y_field="Close", x_field="Datetime"):
+    """Reduce a Datetime-sorted list of documents to at most `threshold` with LTTB on y_field."""
+    if threshold is None or len(docs) <= threshold:
+        return docs
+    x = _fill_gaps(_epoch_seconds([doc.get(x_field) for doc in docs]))
+    y = _fill_gaps(np.array(
+        [v if isinstance(v, (int, float)) else np.nan for v in (doc.get(y_field) for doc in docs)],
+        dtype="float64"
+    ))
+    return [docs[i] for i in lttb_indices(x, y, threshold)]
+
+
+def reduce_signals(docs, threshold, signal_of=lambda doc: doc.get("signal"), y_field="score"):
+    """
+    Reduce periodic summaries to at most `threshold`: keep the rows where the signal
+    changes (the chart markers), then LTTB on y_field if that is still too many.
+    """
+    if threshold is None or len(docs) <= threshold:
+        return docs
+    kept, previous = [], object()
+    for doc in docs:
+        signal = signal_of(doc)
+        if signal != previous:
+            kept.append(doc)
+            previous = signal
+    if kept[-1] is not docs[-1]:
+        kept.append(docs[-1])
+    return lttb(kept, threshold, y_field=y_field)
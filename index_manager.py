@@ -0,0 +1,191 @@
+import datetime
+import threading
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from mongo_client import non_flask_db as db
+
+STOCK_TIME = [("stock_id", ASCENDING), ("ticker", ASCENDING), ("Datetime", ASCENDING)]
+
+# collection -> indexes the backend's queries rely on: (keys, options)
+INDEX_SPECS = {
+    "intraday": [(STOCK_TIME, {})],
+    # Datetime alone: the top gainers snapshot re-checks recent bars across all stocks
+    "historical": [(STOCK_TIME, {}), ([("Datetime", ASCENDING)], {})],
+    # Datetime alone: latest_summary polls recent rows across all stocks
+    "periodic_summary": [(STOCK_TIME, {}), ([("Datetime", ASCENDING)], {})],
+    "open_positions": [
+        (STOCK_TIME, {}),
+        ([("Datetime", ASCENDING)], {}),
+        ([("buy_time", DESCENDING)], {}),
+    ],
+    "login": [([("gid", ASCENDING), ("login_time", DESCENDING)], {})],
+    "user": [
+        ([("gid", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("username", ASCENDING)], {}),
+        ([("device_token", ASCENDING)], {"sparse": True}),
+    ],
+    "ohlcv_cache": [
+        ([("symbol", ASCENDING), ("interval", ASCENDING), ("date", ASCENDING)], {"unique": True}),
+    ],
+    "ohlcv_actions": [([("symbol", ASCENDING)], {"unique": True})],
+    "ticker_meta": [
+        ([("ticker", ASCENDING)], {"unique": True}),
+        ([("expires_at", ASCENDING)], {}),
+    ],
+    "latest_periodic_summary": [
+        ([("stock_id", ASCENDING), ("ticker", ASCENDING)], {"unique": True}),
+        ([("Datetime", DESCENDING)], {}),
+    ],
+}
+
+
+def _sample_range():
+    end = datetime.datetime.utcnow()
+    return {"$gte": end - datetime.timedelta(days=1), "$lte": end}
+
+
+# Query shapes of the hot paths, explained by /api/db/indexes (values are placeholders)
+QUERY_SHAPES = [
+    {"name": "display_chart intraday", "collection": "intraday",
+     "filter": lambda: {"stock_id": 1, "ticker": "X.NS", "Datetime": _sample_range()}, "sort": [("Datetime", 1)]},
+    {"name": "display_chart historical", "collection": "historical",
+     "filter": lambda: {"stock_id": 1, "ticker": "X.NS", "Datetime": _sample_range()}, "sort": [("Datetime", 1)]},
+    {"name": "display_chart periodic_summary", "collection": "periodic_summary",
+     "filter": lambda: {"stock_id": 1, "ticker": "X.NS", "Datetime": _sample_range()}, "sort": [("Datetime", 1)]},
+    {"name": "periodic profits (newest daily bars)", "collection": "historical",
+     "filter": lambda: {"stock_id": 1, "ticker": "X.NS"}, "sort": [("Datetime", -1)]},
+    {"name": "live positions today", "collection": "open_positions",
+     "filter": lambda: {"Datetime": _sample_range()}, "sort": [("buy_time", -1)]},
+    {"name": "last login", "collection": "login",
+     "filter": lambda: {"gid": 1}, "sort": [("login_time", -1)]},
+    {"name": "user by device_token", "collection": "user",
+     "filter": lambda: {"device_token": "x"}, "sort": None},
+    {"name": "user by username", "collection": "user",
+     "filter": lambda: {"username": "x"}, "sort": None},
+    {"name": "ohlcv_cache day range", "collection": "ohlcv_cache",
+     "filter": lambda: {"symbol": "X.NS", "interval": "1d", "date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+     "sort": None},
+    {"name": "ticker_meta expiring", "collection": "ticker_meta",
+     "filter": lambda: {"valid": True, "expires_at": {"$lte": datetime.datetime.utcnow()}}, "sort": [("expires_at", 1)]},
+    {"name": "latest summaries", "collection": "latest_periodic_summary",
+     "filter": lambda: {"stock_id": {"$in": [1, 2, 3]}}, "sort": None},
+]
+
+_reconciler = None
+
+
+def _key_tuple(keys):
+    # Directions as stored: 1 / -1 (1.0 == 1 hashes alike) or "text", "hashed", "2dsphere", ...
+    return tuple((field, direction) for field, direction in keys)
+
+
+def existing_indexes(collection):
+    """{key tuple: index info} of the indexes currently on a collection."""
+    return {_key_tuple(info["key"].items()): info for info in db[collection].list_indexes()}
+
+
+def ensure_indexes(collection):
+    """Create the declared indexes missing on one collection. Returns the names created."""
+    created = []
+    current = existing_indexes(collection)
+    for keys, options in INDEX_SPECS.get(collection, []):
+        if _key_tuple(keys) in current:
+            continue
+        try:
+            created.append(db[collection].create_index(keys, background=True, **options))
+        except OperationFailure as e:
+            print(f"[⚠️] Could not create index {keys} on {collection}: {e}")
+    return created
+
+
+def reconcile_all():
+    """Create every missing declared index. Returns {collection: [created names]}."""
+    created = {}
+    for collection in INDEX_SPECS:
+        try:
+            names = ensure_indexes(collection)
+        except Exception as e:
+            print(f"[⚠️] Index reconciliation failed for {collection}: {e}")
+            continue
+        if names:
+            print(f"Created indexes on {collection}: {', '.join(names)}")
+            created[collection] = names
+    return created
+
+
+def start_reconciler():
+    """Reconcile declared indexes in a background thread (once per process)."""
+    global _reconciler
+    if _reconciler is None or not _reconciler.is_alive():
+        _reconciler = threading.Thread(target=reconcile_all, name="index-reconciler", daemon=True)
+        _reconciler.start()
+    return _reconciler
+
+
+def _index_usage(collection):
+    """{index name: ops since server start} from $indexStats (empty when unavailable)."""
+    try:
+        return {row["name"]: row.get("accesses", {}).get("ops", 0)
+                for row in db[collection].aggregate([{"$indexStats": {}}])}
+    except Exception:
+        return {}
+
+
+def index_report(collection):
+    """Declared vs existing indexes of a collection, with usage counters."""
+    current = existing_indexes(collection)
+    usage = _index_usage(collection)
+    declared = {_key_tuple(keys): options for keys, options in INDEX_SPECS.get(collection, [])}
+    return {
+        "indexes": [
+            {"name": info["name"], "key": dict(info["key"]), "unique": bool(info.get("unique")),
+             "declared": key in declared or info["name"] == "_id_", "ops": usage.get(info["name"])}
+            for key, info in current.items()
+        ],
+        "missing": [
+            {"key": dict(key), **options} for key, options in declared.items() if key not in current
+        ],
+        "unused": [name for name, ops in usage.items() if ops == 0 and name != "_id_"],
+    }
+
+
+def _plan_stages(plan):
+    """Flatten a winning plan into 'STAGE(index)' strings, outermost first."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        children = plan.get("inputStages") or ([plan["inputStage"]] if plan.get("inputStage") else [])
+        plan = children[0] if children else None
+    return stages
+
+
+def explain_shape(shape):
+    cursor = db[shape["collection"]].find(shape["filter"]())
+    if shape["sort"]:
+        cursor = cursor.sort(shape["sort"])
+    explained = cursor.limit(1).explain()
+    winning = explained.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine (MongoDB 7+) nests the classic tree under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages = _plan_stages(winning)
+    return {
+        "name": shape["name"],
+        "collection": shape["collection"],
+        "winning_plan": " <- ".join(stages),
+        "collscan": any(stage.startswith("COLLSCAN") for stage in stages),
+        "in_memory_sort": any(stage.startswith("SORT") for stage in stages),
+    }
+
+
+def query_plan_report():
+    report = []
+    for shape in QUERY_SHAPES:
+        try:
+            report.append(explain_shape(shape))
+        except Exception as e:
+            report.append({"name": shape["name"], "collection": shape["collection"], "error": str(e)})
+    return report
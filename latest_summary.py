@@ -0,0 +1,197 @@
+import time
+import datetime
+import threading
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from mongo_client import non_flask_db as db
+import index_manager
+
+LATEST_COLLECTION = "latest_periodic_summary"
+
+# Fields of periodic_summary the live gainers views need
+SUMMARY_FIELDS = ["stock_id", "ticker", "Datetime", "Close", "Volume",
+                  "profit_percent", "profit_amount", "signal"]
+
+# How often (seconds) periodic_summary is polled, and how many rows are read per batch
+POLL_INTERVAL_SECONDS = 5
+POLL_BATCH = 5000
+# Each poll re-reads rows dated this far behind the watermark (late or rewritten rows)
+OVERLAP_SECONDS = 120
+# Full re-seed interval (seconds), catching rows written further behind than the overlap
+RESYNC_SECONDS = 3600
+
+_lock = threading.Lock()
+_state = {"watermark": None, "seeded": False, "synced_at": None}
+_poller = None
+_listeners = []
+
+
+def _ensure_indexes():
+    # Declared in index_manager.INDEX_SPECS
+    index_manager.ensure_indexes(LATEST_COLLECTION)
+
+
+def _upsert_latest(rows):
+    """
+    Upsert rows into latest_periodic_summary, only replacing an existing row when
+    the new one has a later Datetime, or the same Datetime with changed fields (an
+    in-place update). Rows identical to what is stored are dropped, so re-reading
+    overlapping rows is harmless. Returns the rows that were applied.
+    """
+    newest = {}
+    for row in rows:
+        key = (row.get("stock_id"), row.get("ticker"))
+        if key[0] is None or not key[1] or row.get("Datetime") is None:
+            continue
+        current = newest.get(key)
+        if current is None or row["Datetime"] >= current["Datetime"]:
+            newest[key] = row
+    if not newest:
+        return []
+
+    # Drop rows that are not newer than what is already materialized
+    existing = db[LATEST_COLLECTION].find(
+        {"stock_id": {"$in": list({k[0] for k in newest})}},
+        {f: 1 for f in SUMMARY_FIELDS} | {"_id": 0}
+    )
+    for doc in existing:
+        key = (doc.get("stock_id"), doc.get("ticker"))
+        row = newest.get(key)
+        if row is None or doc.get("Datetime") is None:
+            continue
+        if row["Datetime"] < doc["Datetime"] or (
+                row["Datetime"] == doc["Datetime"] and all(row.get(f) == doc.get(f) for f in SUMMARY_FIELDS)):
+            newest.pop(key)
+    if not newest:
+        return []
+
+    ops = []
+    for (stock_id, ticker), row in newest.items():
+        doc = {f: row.get(f) for f in SUMMARY_FIELDS}
+        doc["source_id"] = row["_id"]
+        ops.append(UpdateOne(
+            {"stock_id": stock_id, "ticker": ticker, "Datetime": {"$lte": row["Datetime"]}},
+            {"$set": doc},
+            upsert=True
+        ))
+    try:
+        db[LATEST_COLLECTION].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate key = an existing row is already newer than this one
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+    return list(newest.values())
+
+
+def seed():
+    """
+    Build (or re-sync) latest_periodic_summary from periodic_summary with one $group
+    pass. Returns the rows that changed.
+    """
+    _ensure_indexes()
+    # All-ascending sort so it walks the STOCK_TIME index; the newest row is each group's last
+    pipeline = [
+        {"$sort": {"stock_id": 1, "ticker": 1, "Datetime": 1}},
+        {"$project": {f: 1 for f in SUMMARY_FIELDS}},
+        {"$group": {
+            "_id": {"stock_id": "$stock_id", "ticker": "$ticker"},
+            "doc": {"$last": "$$ROOT"}
+        }}
+    ]
+    rows = [entry["doc"] for entry in db["periodic_summary"].aggregate(pipeline, allowDiskUse=True)]
+    applied = _upsert_latest(rows)
+    times = [row["Datetime"] for row in rows if row.get("Datetime") is not None]
+    with _lock:
+        _state["watermark"] = max(times) if times else None
+        _state["seeded"] = True
+        _state["synced_at"] = time.monotonic()
+    return applied
+
+
+def _resume():
+    """Resume from the newest Datetime already applied, seeding when the collection is empty."""
+    latest = db[LATEST_COLLECTION].find_one({}, {"Datetime": 1}, sort=[("Datetime", DESCENDING)])
+    if latest is None:
+        seed()
+        return
+    _ensure_indexes()
+    with _lock:
+        _state["watermark"] = latest["Datetime"]
+        _state["seeded"] = True
+        _state["synced_at"] = time.monotonic()
+
+
+def poll():
+    """
+    Apply periodic_summary rows dated from OVERLAP_SECONDS before the watermark (newest
+    Datetime seen) on, read in (Datetime, _id) order. The overlap picks up rows that land
+    late or are rewritten in place; unchanged rows are dropped by _upsert_latest. Re-seeds
+    every RESYNC_SECONDS. Returns the rows that became the latest for their (stock_id, ticker).
+    """
+    if not _state["seeded"]:
+        _resume()
+    if time.monotonic() - _state["synced_at"] >= RESYNC_SECONDS:
+        return seed()
+    watermark = _state["watermark"]
+    query = {"Datetime": {"$type": "date"}} if watermark is None else {
+        "Datetime": {"$gte": watermark - datetime.timedelta(seconds=OVERLAP_SECONDS)}
+    }
+    applied = []
+    while True:
+        rows = list(
+            db["periodic_summary"].find(query, {f: 1 for f in SUMMARY_FIELDS})
+            .sort([("Datetime", ASCENDING), ("_id", ASCENDING)])
+            .limit(POLL_BATCH)
+        )
+        if not rows:
+            return applied
+        applied.extend(_upsert_latest(rows))
+        last = rows[-1]
+        with _lock:
+            if _state["watermark"] is None or last["Datetime"] > _state["watermark"]:
+                _state["watermark"] = last["Datetime"]
+        if len(rows) < POLL_BATCH:
+            return applied
+        # Next batch: keyset on (Datetime, _id)
+        query = {"$or": [
+            {"Datetime": {"$gt": last["Datetime"]}},
+            {"Datetime": last["Datetime"], "_id": {"$gt": last["_id"]}},
+        ]}
+
+
+def fetch_latest(stocks):
+    """Latest summary row per stock for the given stock_id -> ticker mapping (at most len(stocks) docs)."""
+    if not _state["seeded"]:
+        _resume()
+    cursor = db[LATEST_COLLECTION].find(
+        {"stock_id": {"$in": [int(sid) for sid in stocks.keys()]}},
+        {"_id": 0, "source_id": 0}
+    )
+    return [doc for doc in cursor if stocks.get(doc.get("stock_id")) == doc.get("ticker")]
+
+
+def add_listener(callback):
+    """Register callback(rows) called by the poller with the rows that became the latest."""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def _poll_loop():
+    while True:
+        try:
+            applied = poll()
+            if applied:
+                for callback in list(_listeners):
+                    callback(applied)
+        except Exception as e:
+            print(f"[❌] latest_periodic_summary poller error: {e}")
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def start_poller():
+    """Start the background high-watermark poller (once per process)."""
+    global _poller
+    if _poller is None or not _poller.is_alive():
+        _poller = threading.Thread(target=_poll_loop, name="latest-summary-poller", daemon=True)
+        _poller.start()
+    return _poller
@@ -0,0 +1,180 @@
+import os
+import time
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+os_holiday_file = os.getenv("HOLIDAY_FILE", "/shared/holiday.txt")
+
+# NSE trades Monday to Friday
+WEEKMASK = "1111100"
+
+# How often (seconds) the holiday file mtime is re-checked
+RELOAD_CHECK_SECONDS = 2.0
+
+
+def _as_date(value):
+    """Normalize a date / datetime / np.datetime64 / 'YYYY-MM-DD' string to datetime.date."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[D]").astype(datetime.date)
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value[:10], "%Y-%m-%d").date()
+    raise TypeError(f"Unsupported date value: {value!r}")
+
+
+def _as_day_array(values):
+    """Normalize an iterable of dates (list, ndarray, DatetimeIndex, Series) to datetime64[D]."""
+    idx = pd.DatetimeIndex(values)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return idx.values.astype("datetime64[D]")
+
+
+class MarketCalendar:
+    """
+    In-memory NSE trading calendar.
+    The holiday file is parsed once and reloaded only when its mtime changes.
+    Single lookups go through a per-year trading-day bitmap, range helpers
+    through a NumPy busday calendar.
+    """
+
+    def __init__(self, holiday_file=os_holiday_file):
+        self.holiday_file = holiday_file
+        self._lock = threading.Lock()
+        self._mtime = -1
+        self._last_check = 0.0
+        self._holidays = frozenset()
+        self._busdaycal = np.busdaycalendar(weekmask=WEEKMASK)
+        self._year_bitmaps = {}
+
+    # ---------- loading ----------
+    def _load_holidays(self):
+        holidays = set()
+        try:
+            with open(self.holiday_file, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        holidays.add(datetime.datetime.strptime(line, "%Y-%m-%d").date())
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            print(f"[⚠️] Holiday file not found: {self.holiday_file}")
+        return frozenset(holidays)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._mtime != -1 and now - self._last_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+        try:
+            mtime = os.stat(self.holiday_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            holidays = self._load_holidays()
+            busdaycal = np.busdaycalendar(
+                weekmask=WEEKMASK,
+                holidays=np.array(sorted(holidays), dtype="datetime64[D]")
+            )
+            # Swap everything at once so readers never see a mixed state
+            self._holidays = holidays
+            self._busdaycal = busdaycal
+            self._year_bitmaps = {}
+            self._mtime = mtime
+
+    def reload(self):
+        """Force a reload on the next lookup."""
+        self._mtime = -1
+
+    @property
+    def holidays(self):
+        self._refresh()
+        return self._holidays
+
+    @property
+    def busdaycal(self):
+        self._refresh()
+        return self._busdaycal
+
+    def _year_bitmap(self, year):
+        bitmaps = self._year_bitmaps
+        bitmap = bitmaps.get(year)
+        if bitmap is None:
+            days = np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]")
+            bitmap = np.is_busday(days, busdaycal=self._busdaycal)
+            bitmaps[year] = bitmap
+        return bitmap
+
+    # ---------- lookups ----------
+    def is_trading_day(self, dates):
+        """
+        True if the date is a trading day (not a weekend, not a holiday).
+        Accepts a single date/datetime or an array-like of dates; the latter returns a bool ndarray.
+        """
+        self._refresh()
+        if isinstance(dates, (datetime.date, np.datetime64, str)):
+            d = _as_date(dates)
+            return bool(self._year_bitmap(d.year)[d.timetuple().tm_yday - 1])
+        return np.is_busday(_as_day_array(dates), busdaycal=self._busdaycal)
+
+    def trading_days_between(self, start, end):
+        """All trading days in [start, end] (inclusive) as a datetime64[D] array."""
+        self._refresh()
+        start_d = np.datetime64(_as_date(start), "D")
+        end_d = np.datetime64(_as_date(end), "D")
+        if end_d < start_d:
+            return np.array([], dtype="datetime64[D]")
+        days = np.arange(start_d, end_d + 1, dtype="datetime64[D]")
+        return days[np.is_busday(days, busdaycal=self._busdaycal)]
+
+    def count_trading_days(self, start, end):
+        """Number of trading days in [start, end] (inclusive)."""
+        self._refresh()
+        start_d = np.datetime64(_as_date(start), "D")
+        end_d = np.datetime64(_as_date(end), "D")
+        return int(np.busday_count(start_d, end_d + 1, busdaycal=self._busdaycal))
+
+    def nth_trading_day_before(self, date, n):
+        """The n-th trading day strictly before `date` (n >= 1) as datetime.date."""
+        self._refresh()
+        d = np.datetime64(_as_date(date), "D")
+        return np.busday_offset(d, -n, roll="forward", busdaycal=self._busdaycal).astype(datetime.date)
+
+    def last_trading_day(self, date):
+        """`date` itself if it is a trading day, else the closest trading day before it."""
+        self._refresh()
+        d = np.datetime64(_as_date(date), "D")
+        return np.busday_offset(d, 0, roll="backward", busdaycal=self._busdaycal).astype(datetime.date)
+
+    def next_trading_day(self, date):
+        """The first trading day strictly after `date` as datetime.date."""
+        self._refresh()
+        d = np.datetime64(_as_date(date), "D")
+        return np.busday_offset(d, 1, roll="backward", busdaycal=self._busdaycal).astype(datetime.date)
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_market_calendar(holiday_file=None):
+    """Process-wide MarketCalendar for the given holiday file (default: HOLIDAY_FILE)."""
+    holiday_file = holiday_file or os_holiday_file
+    calendar = _calendars.get(holiday_file)
+    if calendar is None:
+        with _calendars_lock:
+            calendar = _calendars.setdefault(holiday_file, MarketCalendar(holiday_file))
+    return calendar
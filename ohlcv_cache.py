@@ -0,0 +1,354 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytz
+import yfinance as yf
+from pymongo import UpdateOne
+from mongo_client import non_flask_db as db
+import index_manager
+from market_calendar import get_market_calendar
+from single_flight import get_single_flight
+
+IST = pytz.timezone("Asia/Kolkata")
+UTC = pytz.utc
+
+CACHE_COLLECTION = "ohlcv_cache"
+# Corporate actions seen per symbol; a new one invalidates the symbol's older cached days
+ACTIONS_COLLECTION = "ohlcv_actions"
+
+# Bars of the session still in progress are refreshed after this many seconds
+LIVE_TTL_SECONDS = 60
+# Past trading days that came back without bars (dropped by yfinance, an exchange
+# holiday missing from the calendar) are re-fetched after this many seconds
+EMPTY_TTL_SECONDS = 300
+
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+# yfinance back-adjusts every earlier bar for these (prices/volume for splits, Adj Close for dividends)
+ACTION_FIELDS = ["Stock Splits", "Dividends"]
+DAILY_INTERVALS = {"1d", "5d", "1wk", "1mo", "3mo"}
+# Intervals whose bars can be bucketed per trading day
+CACHEABLE_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d"}
+NSE_SUFFIXES = (".NS", ".BO")
+
+# Concurrent identical yfinance calls share one upstream request
+UPSTREAM_TIMEOUT_SECONDS = 30
+upstream = get_single_flight("yfinance", timeout=UPSTREAM_TIMEOUT_SECONDS)
+
+_indexes_ready = False
+
+
+def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    try:
+        # Declared in index_manager.INDEX_SPECS
+        index_manager.ensure_indexes(CACHE_COLLECTION)
+        index_manager.ensure_indexes(ACTIONS_COLLECTION)
+        _indexes_ready = True
+    except Exception as e:
+        print(f"[⚠️] Could not create {CACHE_COLLECTION} index: {e}")
+
+
+def _is_nse(symbol):
+    return symbol.upper().endswith(NSE_SUFFIXES)
+
+
+def _trading_days(symbol, start, end):
+    """Candidate trading days in [start, end]; NSE symbols use the holiday calendar, others plain weekdays."""
+    if _is_nse(symbol):
+        return [d.astype(datetime.date) for d in get_market_calendar().trading_days_between(start, end)]
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1, dtype="datetime64[D]")
+    return [d.astype(datetime.date) for d in days[np.is_busday(days)]]
+
+
+def _first_open_day(symbol, today):
+    """Earliest day whose session may still be in progress (and must not be cached permanently)."""
+    if _is_nse(symbol):
+        return today
+    # Non-IST exchanges can still be trading yesterday's session during the IST morning
+    return today - datetime.timedelta(days=1)
+
+
+def resolve_period(symbol, period, today=None):
+    """
+    Translate a yfinance period (5d, 1mo, 1y, ytd, ...) into an inclusive (start, end) date range.
+    Returns None for periods that cannot be mapped (e.g. max), which bypass the cache.
+    """
+    today = today or datetime.datetime.now(IST).date()
+    period = (period or "").strip().lower()
+    try:
+        if period == "ytd":
+            return datetime.date(today.year, 1, 1), today
+        if period.endswith("mo"):
+            start = (pd.Timestamp(today) - pd.DateOffset(months=int(period[:-2]))).date()
+        elif period.endswith("y"):
+            start = (pd.Timestamp(today) - pd.DateOffset(years=int(period[:-1]))).date()
+        elif period.endswith("d"):
+            days = int(period[:-1])
+            if _is_nse(symbol):
+                calendar = get_market_calendar()
+                start = calendar.nth_trading_day_before(calendar.next_trading_day(today), days)
+            else:
+                start = np.busday_offset(np.datetime64(today, "D"), -(days - 1), roll="backward").astype(datetime.date)
+        else:
+            return None
+    except ValueError:
+        return None
+    return start, today
+
+
+def _missing_ranges(days, cached):
+    """Group consecutive days without a usable cache entry into (start, end) ranges."""
+    ranges = []
+    prev_idx = None
+    for idx, day in enumerate(days):
+        if day in cached:
+            continue
+        if ranges and prev_idx == idx - 1:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+        prev_idx = idx
+    return [tuple(r) for r in ranges]
+
+
+def fetch_history(symbol, interval="1d", start=None, end=None, period=None):
+    """
+    yf.Ticker(symbol).history(..., auto_adjust=False), coalesced across concurrent
+    identical requests. Every caller gets its own copy of the frame.
+    """
+    key = ("history", symbol.strip().upper(), interval, start, end, None if start and end else period)
+
+    def _fetch():
+        ticker = yf.Ticker(symbol)
+        if start and end:
+            return ticker.history(start=start, end=end, interval=interval, auto_adjust=False)
+        return ticker.history(period=period, interval=interval, auto_adjust=False)
+
+    return upstream.do(key, _fetch).copy()
+
+
+def _fetch_range(symbol, interval, start, end):
+    """Fetch [start, end] (inclusive) from yfinance."""
+    return fetch_history(
+        symbol,
+        interval,
+        start=start.strftime("%Y-%m-%d"),
+        end=(end + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    )
+
+
+def _frame_to_day_docs(symbol, interval, data, days, open_from, now_utc):
+    """
+    Split a yfinance frame into one cache document per day in `days` (all trading days
+    per the calendar). Only past days that got bars are complete; a day without bars
+    is stored empty and re-fetched once its TTL passes.
+    """
+    bars_by_day = {day: [] for day in days}
+    tz = None
+    if data is not None and not data.empty:
+        if not isinstance(data.index, pd.DatetimeIndex):
+            data.index = pd.to_datetime(data.index, errors='coerce')
+        tz = str(data.index.tz) if data.index.tz is not None else None
+        utc_index = data.index.tz_convert(UTC) if tz else data.index.tz_localize(UTC)
+        local_days = data.index.date
+        columns = [c for c in PRICE_FIELDS if c in data.columns]
+        values = data[columns].to_numpy(dtype="float64")
+        for ts, day, row in zip(utc_index, local_days, values):
+            if day not in bars_by_day:
+                continue
+            bar = {"t": ts.to_pydatetime().replace(tzinfo=None)}
+            for col, val in zip(columns, row):
+                bar[col] = None if np.isnan(val) else float(val)
+            bars_by_day[day].append(bar)
+
+    docs = []
+    for day, bars in bars_by_day.items():
+        docs.append({
+            "symbol": symbol,
+            "interval": interval,
+            "date": day.strftime("%Y-%m-%d"),
+            "tz": tz,
+            "bars": bars,
+            "complete": day < open_from and bool(bars),
+            "fetched_at": now_utc
+        })
+    return docs
+
+
+def _frame_actions(data):
+    """Corporate actions in a yfinance frame, as "YYYY-MM-DD Field=value" strings."""
+    actions = set()
+    if data is None or data.empty:
+        return actions
+    for field in ACTION_FIELDS:
+        if field not in data.columns:
+            continue
+        values = data[field].to_numpy(dtype="float64")
+        for day, value in zip(data.index.date, values):
+            if value and not np.isnan(value):
+                actions.add(f"{day:%Y-%m-%d} {field}={value:g}")
+    return actions
+
+
+def _record_actions(symbol, data, now_utc):
+    """
+    Record the corporate actions in a fetched frame. On one not seen before, the symbol's
+    days cached before it (fetched before now_utc, so not yet adjusted) are deleted.
+    Returns the earliest new action day, or None.
+    """
+    actions = _frame_actions(data)
+    if not actions:
+        return None
+    known = db[ACTIONS_COLLECTION].find_one({"symbol": symbol}) or {}
+    new = actions - set(known.get("actions", []))
+    if not new:
+        return None
+    first = min(action.split(" ")[0] for action in new)
+    db[CACHE_COLLECTION].delete_many({"symbol": symbol, "date": {"$lt": first}, "fetched_at": {"$lt": now_utc}})
+    db[ACTIONS_COLLECTION].update_one(
+        {"symbol": symbol}, {"$addToSet": {"actions": {"$each": sorted(new)}}}, upsert=True
+    )
+    return datetime.datetime.strptime(first, "%Y-%m-%d").date()
+
+
+def _docs_to_frame(docs, interval):
+    rows, tz = [], None
+    for doc in docs:
+        tz = tz or doc.get("tz")
+        rows.extend(doc.get("bars", []))
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    index = pd.DatetimeIndex(pd.to_datetime(df.pop("t"), utc=True))
+    if tz:
+        index = index.tz_convert(tz)
+    # Same index name yfinance uses, so callers see an identical frame after reset_index()
+    index.name = "Date" if interval in DAILY_INTERVALS else "Datetime"
+    df.index = index
+    return df.sort_index()
+
+
+def get_history(symbol, interval="1d", start=None, end=None, period=None):
+    """
+    Read-through replacement for yf.Ticker(symbol).history(..., auto_adjust=False).
+    `end` is exclusive, as in yfinance. Completed trading days are served from the
+    ohlcv_cache collection until a new split or dividend shows up in a fetched range (then
+    the days before it are re-fetched); the current session is refreshed after LIVE_TTL_SECONDS;
+    trading days that came back without bars are retried after EMPTY_TTL_SECONDS;
+    only the missing sub-ranges are fetched upstream.
+    """
+    now_ist = datetime.datetime.now(IST)
+    today = now_ist.date()
+
+    if start and end:
+        start_d = datetime.datetime.strptime(start, "%Y-%m-%d").date()
+        end_d = datetime.datetime.strptime(end, "%Y-%m-%d").date() - datetime.timedelta(days=1)
+        date_range = (start_d, end_d)
+    else:
+        date_range = resolve_period(symbol, period, today)
+
+    if interval not in CACHEABLE_INTERVALS or date_range is None:
+        return fetch_history(symbol, interval, start=start, end=end, period=period)
+
+    start_d, end_d = date_range
+    end_d = min(end_d, today)
+    days = _trading_days(symbol, start_d, end_d) if start_d <= end_d else []
+    if not days:
+        return pd.DataFrame()
+
+    _ensure_indexes()
+    collection = db[CACHE_COLLECTION]
+    open_from = _first_open_day(symbol, today)
+    now_utc = datetime.datetime.utcnow()
+    ttl_cutoff = now_utc - datetime.timedelta(seconds=LIVE_TTL_SECONDS)
+    empty_cutoff = now_utc - datetime.timedelta(seconds=EMPTY_TTL_SECONDS)
+
+    day_keys = {d.strftime("%Y-%m-%d"): d for d in days}
+    cached = {}
+    for doc in collection.find({"symbol": symbol, "interval": interval, "date": {"$in": list(day_keys)}}):
+        day = day_keys.get(doc["date"])
+        if day is None:
+            continue
+        fetched_at = doc.get("fetched_at", datetime.datetime.min)
+        # Empty past days wait EMPTY_TTL_SECONDS; the open session (empty or not) LIVE_TTL_SECONDS
+        cutoff = empty_cutoff if not doc.get("bars") and day < open_from else ttl_cutoff
+        if doc.get("complete") or fetched_at >= cutoff:
+            cached[day] = doc
+
+    pending = _missing_ranges(days, cached)
+    while pending:
+        range_start, range_end = pending.pop(0)
+        data = _fetch_range(symbol, interval, range_start, range_end)
+        range_days = [d for d in days if range_start <= d <= range_end]
+        day_docs = _frame_to_day_docs(symbol, interval, data, range_days, open_from, now_utc)
+        action_day = _record_actions(symbol, data, now_utc)
+        try:
+            collection.bulk_write([
+                UpdateOne(
+                    {"symbol": symbol, "interval": interval, "date": doc["date"]},
+                    {"$set": doc},
+                    upsert=True
+                )
+                for doc in day_docs
+            ], ordered=False)
+        except Exception as e:
+            print(f"[⚠️] Could not store OHLCV cache for {symbol}: {e}")
+        for doc in day_docs:
+            cached[day_keys[doc["date"]]] = doc
+        if action_day:
+            # Days read from the cache before the action predate its adjustment: fetch them again
+            cached = {d: doc for d, doc in cached.items() if d >= action_day or doc["fetched_at"] >= now_utc}
+            pending = _missing_ranges(days, cached)
+
+    return _docs_to_frame([cached[d] for d in days if d in cached], interval)
+
+
+# Upper bound of tickers per yf.download call in download_history_batch
+BATCH_GROUP_SIZE = 20
+
+
+def download_history_batch(symbols, interval="1d", start=None, end=None, period=None):
+    """
+    Fetch several symbols with one multi-ticker yf.download call per group of BATCH_GROUP_SIZE.
+    Returns (frames, errors) keyed by upper-cased symbol, as yf.download names its columns.
+    """
+    frames, errors = {}, {}
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols))
+    for i in range(0, len(symbols), BATCH_GROUP_SIZE):
+        group = symbols[i:i + BATCH_GROUP_SIZE]
+        kwargs = {"start": start, "end": end} if start and end else {"period": period}
+        key = ("download", tuple(group), interval, tuple(sorted(kwargs.items())))
+        try:
+            data = upstream.do(key, lambda: yf.download(
+                group,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=False,
+                threads=True,
+                progress=False,
+                **kwargs
+            ))
+        except Exception as e:
+            for symbol in group:
+                errors[symbol] = str(e)
+            continue
+
+        for symbol in group:
+            if data is None or data.empty:
+                errors[symbol] = "No data found for given parameters"
+                continue
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    errors[symbol] = "No data found for given parameters"
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            frame = frame.dropna(how="all")
+            if frame.empty:
+                errors[symbol] = "No data found for given parameters"
+                continue
+            frames[symbol] = frame
+    return frames, errors
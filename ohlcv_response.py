@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+RESPONSE_FIELDS = ["Date"] + PRICE_COLUMNS + ["Volume"]
+
+
+def _date_strings(dates):
+    """Vectorized YYYY-MM-DD formatting of a datetime Series (tz-aware dates keep their local day)."""
+    dates = pd.to_datetime(dates, errors='coerce')
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return np.datetime_as_string(dates.to_numpy(dtype="datetime64[D]"), unit="D").tolist()
+
+
+def build_columns(data):
+    """
+    One list per field, built column-wise from the reset_index()'d history frame.
+    Prices are rounded to 2 decimals, Volume is an int.
+    """
+    columns = {"Date": _date_strings(data["Date"])}
+    for col in PRICE_COLUMNS:
+        columns[col] = np.round(data[col].to_numpy(dtype="float64"), 2).tolist()
+    columns["Volume"] = data["Volume"].fillna(0).to_numpy(dtype="int64").tolist()
+    return columns
+
+
+def build_rows(data):
+    """Same payload as build_columns, as a list of per-row dicts (the /api/stock default)."""
+    columns = build_columns(data)
+    return [dict(zip(RESPONSE_FIELDS, values)) for values in zip(*(columns[f] for f in RESPONSE_FIELDS))]
+
@@ -0,0 +1,96 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "mimetype", "expires_at", "size")
+
+    def __init__(self, body, mimetype, expires_at, size):
+        self.body = body
+        self.etag = hashlib.md5(body).hexdigest()
+        self.mimetype = mimetype
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ResponseCache:
+    """
+    LRU of serialized response bodies bounded by total bytes.
+    Entries put with ttl=None never expire (they can still be evicted);
+    others are dropped on the first lookup after their TTL.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "too_large": 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= now:
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key, body, ttl=None, mimetype="application/json"):
+        """Store body (bytes) under key; returns the CachedResponse (also when too large to keep)."""
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        entry = CachedResponse(body, mimetype, expires_at, len(body) + len(repr(key)))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry.size > self.max_bytes:
+                self._stats["too_large"] += 1
+                return entry
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                old_key, _ = next(iter(self._entries.items()))
+                self._remove(old_key)
+                self._stats["evictions"] += 1
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes})
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(name, max_bytes=64 * 1024 * 1024):
+    """Process-wide ResponseCache by name (max_bytes applies on first creation)."""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(name, ResponseCache(name, max_bytes))
+    return cache
+
+
+def all_stats():
+    return {name: cache.stats() for name, cache in list(_caches.items())}
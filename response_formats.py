@@ -0,0 +1,166 @@
+import json
+import datetime
+from bson.objectid import ObjectId
+from flask import request, jsonify, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# Accept header media types -> format
+ACCEPT_FORMATS = {
+    MSGPACK_MIMETYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+    ARROW_MIMETYPE: "arrow",
+    "application/json": "rows",
+}
+FORMATS = ("rows", "columns", "msgpack", "arrow")
+
+
+class FormatUnavailable(Exception):
+    """The requested format needs a library that is not installed."""
+
+
+def negotiate_format(default="rows"):
+    """
+    Response format for the current request: format= wins, then the best Accept match,
+    then `default`. Returns None for an unknown format= value.
+    """
+    requested = request.args.get("format")
+    if requested:
+        return requested if requested in FORMATS else None
+    best = request.accept_mimetypes.best_match(list(ACCEPT_FORMATS))
+    if best and request.accept_mimetypes[best] > request.accept_mimetypes["application/json"]:
+        return ACCEPT_FORMATS[best]
+    return default
+
+
+def _plain(value):
+    """BSON / datetime values as JSON-friendly scalars."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def to_columns(records):
+    """
+    Struct-of-arrays form of a list of dicts: {field: [values]}, fields in first-seen
+    order, None where a record lacks the field.
+    """
+    fields = {}
+    for record in records:
+        for key in record:
+            fields.setdefault(key, None)
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def _msgpack_default(value):
+    converted = _plain(value)
+    if converted is value:
+        return str(value)
+    return converted
+
+
+def encode_msgpack(payload):
+    if msgpack is None:
+        raise FormatUnavailable("msgpack is not installed on the server")
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def arrow_array(values):
+    """Arrow array of a column of Python values; values that fit no type are JSON-encoded as strings."""
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, OverflowError):
+        # Mixed or nested values: JSON-encode everything that is not already a string
+        out = []
+        for value in values:
+            value = _plain(value)
+            out.append(value if value is None or isinstance(value, str) else json.dumps(value, default=str))
+        return pa.array(out, type=pa.string())
+
+
+def arrow_schema(sample, columns):
+    """
+    Arrow schema inferred from sampled records. Integer columns stay int64 (float64 only
+    when the sample itself mixes ints and floats) and all-null columns become strings.
+    """
+    fields = []
+    for column in columns:
+        arrow_type = arrow_array([record.get(column) for record in sample]).type
+        if pa.types.is_null(arrow_type):
+            arrow_type = pa.string()
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def arrow_record_batch(records, schema):
+    """
+    Record batch of records in a fixed schema. Each column is inferred on its own and
+    then cast safely; a value that does not fit raises ValueError instead of being
+    truncated or nulled.
+    """
+    arrays = []
+    for field in schema:
+        array = arrow_array([record.get(field.name) for record in records])
+        if array.type != field.type:
+            try:
+                array = array.cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+                raise ValueError(
+                    f"Field '{field.name}' has {array.type} values that do not fit the exported type {field.type}: {e}"
+                )
+        arrays.append(array)
+    return pa.record_batch(arrays, schema=schema)
+
+
+def encode_arrow(columns, meta=None):
+    """Arrow IPC stream of one table built from {field: [values]}; `meta` goes into the schema metadata as JSON."""
+    if pa is None:
+        raise FormatUnavailable("pyarrow is not installed on the server")
+    table = pa.table({field: arrow_array(values) for field, values in columns.items()})
+    if meta:
+        table = table.replace_schema_metadata({"meta": json.dumps(meta, default=_msgpack_default)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_body(fmt, payload, table=None, meta=None):
+    """
+    Serialized body and mimetype for a negotiated format.
+    rows/columns: JSON of `payload`; msgpack: `payload`; arrow: `table` ({field: [values]}) with `meta`.
+    """
+    if fmt == "msgpack":
+        return encode_msgpack(payload), MSGPACK_MIMETYPE
+    if fmt == "arrow":
+        return encode_arrow(table if table is not None else {}, meta), ARROW_MIMETYPE
+    return jsonify(payload).get_data(), "application/json"
+
+
+def make_response(fmt, payload, table=None, meta=None):
+    """Response for a negotiated format (406 when its library is missing)."""
+    try:
+        body, mimetype = encode_body(fmt, payload, table, meta)
+    except FormatUnavailable as e:
+        return jsonify({"error": str(e)}), 406
+    response = Response(body, mimetype=mimetype)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def unknown_format_error():
+    return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
@@ -10,6 +10,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import pytz
 from mongo_client import non_flask_db as db  # direct pymongo Database
+import index_manager
 # Add parent directory (Backend) to Python path
 from logger_config import setup_gibsi_logging
 auth_logger = setup_gibsi_logging()
@@ -28,9 +29,8 @@ def init_auth(app):
     app.config["SECRET_KEY"] = JWT_SECRET_KEY  # optional but safe
     JWTManager(app)
 
-    # Create unique indexes
-    db["user"].create_index("gid", unique=True)
-    db["user"].create_index("email", unique=True)
+    # Create unique indexes (declared in index_manager.INDEX_SPECS)
+    index_manager.ensure_indexes("user")
 
     # Initialize counter document for gid if not exists
     if not db["counters"].find_one({"_id": "gid"}):
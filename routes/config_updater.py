@@ -5,6 +5,7 @@ from yaml.dumper import SafeDumper
 import os
 import re
 import csv
+from stock_registry import get_stock_registry, os_stocks_file
 
 config_update_api = Blueprint("config_update_api", __name__)
 
@@ -47,7 +48,7 @@ def quote_strings(obj):
         return obj
 
 class ConfigUpdater:
-    def __init__(self, stocks_file_path="/shared/stocks_list.txt", trade_config_path="/shared/trade_config.yaml"):
+    def __init__(self, stocks_file_path=os_stocks_file, trade_config_path="/shared/trade_config.yaml"):
         self.stocks_file_path = stocks_file_path
         self.trade_config_path = trade_config_path
 
@@ -89,6 +90,9 @@ class ConfigUpdater:
             for entry in final_entries:
                 writer.writerow(entry)
 
+        # Readers must not wait for the mtime check to see the new universe
+        get_stock_registry(self.stocks_file_path).invalidate()
+
         return True, "Stocks list updated successfully"
 
     def update_trade_config(self, updates):
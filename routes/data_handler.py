@@ -1,9 +1,17 @@
 # data_handler.py
-from flask import Blueprint, request, jsonify
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, Response
 from datetime import datetime, timedelta, timezone
 from bson.objectid import ObjectId
 from pymongo import ASCENDING, DESCENDING
 from mongo_client import non_flask_db as db
+import response_formats
+from doc_serializer import get_serializer, serialize_docs
+import index_manager
 
 
 COLLECTIONS = [
@@ -16,6 +24,30 @@ COLLECTIONS = [
     "counters",
 ]
 
+# Collections whose documents carry no Datetime field (no first/last probes)
+NO_DATETIME_COLLECTIONS = {"user", "counters", "login"}
+
+# collections_overview is recomputed at most once per TTL unless refresh=1
+OVERVIEW_TTL_SECONDS = 60
+_overview_cache = {"expires_at": 0, "data": None}
+_overview_lock = threading.Lock()
+
+# collection_data: per-collection "has Datetime" probe and per-filter totals, short-lived
+SCHEMA_TTL_SECONDS = 300
+COUNT_TTL_SECONDS = 30
+COUNT_CACHE_MAX_ENTRIES = 512
+# approx_total=1 on a filtered listing counts at most this many documents
+APPROX_COUNT_LIMIT = 10000
+_schema_cache = {}
+_count_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# data_query: page -> keyset cursor of the previous page's last row, so page=N+1 after
+# page=N is served without skip(); stream=1 reads the cursor in batches of this size
+PAGE_CURSOR_CACHE_MAX_ENTRIES = 2048
+STREAM_BATCH_SIZE = 2000
+_page_cursors = OrderedDict()
+
 data_handler_api = Blueprint("data_handler_api", __name__)
 
 def parse_iso_date(dt_str):
@@ -45,94 +77,80 @@ def serialize_doc(doc, db_name="intraday"):
     - convert datetime fields to IST strings
     - convert _id to hex string under key '_id'
     - remove internal keys (stock_id/type) if present
+    Pages should go through serialize_docs(), which formats datetimes column-wise.
     """
-    doc = dict(doc)  # copy
-    # Keep original _id as string for frontend (but don't keep BSON object)
-    oid = doc.get("_id")
-    if oid is not None:
-        try:
-            doc["_id"] = str(oid)
-        except Exception:
-            doc["_id"] = str(oid)
-
-    # Remove helper keys not intended for frontend
-    doc.pop("stock_id", None)
-    doc.pop("type", None)
-
-    # For user/login collections: convert created_at/last_login/login_time
-    if db_name in ("login", "user"):
-        for dt_field in ("created_at", "last_login", "login_time", "logout_time"):
-            dt = doc.get(dt_field)
-            if dt:
-                try:
-                    if hasattr(dt, "isoformat"):
-                        if dt.tzinfo is None:
-                            dt = dt.replace(tzinfo=timezone.utc)
-                        doc[dt_field] = dt.astimezone(timezone(timedelta(hours=5, minutes=30))).strftime("%Y-%m-%d %H:%M:%S")
-                    elif isinstance(dt, dict) and "$date" in dt:
-                        utc_dt = datetime.fromisoformat(dt["$date"].replace("Z", "+00:00"))
-                        doc[dt_field] = utc_dt.astimezone(timezone(timedelta(hours=5, minutes=30))).strftime("%Y-%m-%d %H:%M:%S")
-                    else:
-                        doc[dt_field] = str(dt)
-                except Exception:
-                    doc[dt_field] = str(dt)
-        # Remove Datetime if present (these collections use created_at / login_time)
-        doc.pop("Datetime", None)
+    return get_serializer(db_name).serialize(doc)
 
-    else:
-        # For other collections, convert Datetime if present
-        dt = doc.get("Datetime")
-        if dt:
-            try:
-                # If it's a proper datetime
-                if hasattr(dt, "isoformat"):
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    dt_ist = dt.astimezone(timezone(timedelta(hours=5, minutes=30)))
-                    if db_name in ("intraday", "periodic_summary"):
-                        # intraday / periodic: show time only for readability
-                        doc["Datetime"] = dt_ist.strftime("%H:%M:%S")
-                    else:
-                        doc["Datetime"] = dt_ist.strftime("%Y-%m-%d %H:%M:%S")
-                # If mongo-style {'$date': '...Z'}
-                elif isinstance(dt, dict) and "$date" in dt:
-                    utc_dt = datetime.fromisoformat(dt["$date"].replace("Z", "+00:00"))
-                    dt_ist = utc_dt.astimezone(timezone(timedelta(hours=5, minutes=30)))
-                    if db_name in ("intraday", "periodic_summary"):
-                        doc["Datetime"] = dt_ist.strftime("%H:%M:%S")
-                    else:
-                        doc["Datetime"] = dt_ist.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    doc["Datetime"] = str(dt)
-            except Exception:
-                doc["Datetime"] = str(dt)
 
-    # Preferred ordering for frontend columns
-    default_orders = {
-        "intraday": ["Datetime", "ticker", "Open", "High", "Low", "Close", "Volume"],
-        "periodic_summary": ["Datetime", "ticker", "signal", "score", "reasons"],
-    }
-    preferred_keys = default_orders.get(db_name, [])
+def parse_keyset_cursor(token):
+    """'<ISO Datetime>|<ObjectId hex>' -> (datetime, ObjectId); raises ValueError."""
+    dt_str, oid_str = token.split("|")
+    dt_cursor = parse_iso_date(dt_str)
+    if dt_cursor is None:
+        raise ValueError("invalid cursor datetime")
+    return dt_cursor, ObjectId(oid_str)
+
+
+def keyset_filter(dt_cursor, oid_cursor):
+    # Datetime > dt_cursor OR (Datetime == dt_cursor AND _id > oid_cursor)
+    return {"$or": [
+        {"Datetime": {"$gt": dt_cursor}},
+        {"Datetime": dt_cursor, "_id": {"$gt": oid_cursor}},
+    ]}
+
+
+def keyset_token(doc):
+    dt = doc.get("Datetime")
+    dt_iso = dt.isoformat() if hasattr(dt, "isoformat") else str(dt)
+    return f"{dt_iso}|{doc.get('_id')}"
+
+
+def _remember_page_cursor(key, token):
+    with _cache_lock:
+        _page_cursors[key] = token
+        _page_cursors.move_to_end(key)
+        while len(_page_cursors) > PAGE_CURSOR_CACHE_MAX_ENTRIES:
+            _page_cursors.popitem(last=False)
+
 
-    ordered_doc = {k: doc[k] for k in preferred_keys if k in doc}
-    for key in doc:
-        if key not in ordered_doc:
-            ordered_doc[key] = doc[key]
+def stream_ndjson(collection, query, db_name):
+    """NDJSON response of every document matching query, read in STREAM_BATCH_SIZE batches."""
+    def generate():
+        cursor = (
+            collection.find(query)
+            .sort([("Datetime", ASCENDING), ("_id", ASCENDING)])
+            .batch_size(STREAM_BATCH_SIZE)
+        )
+        try:
+            batch = []
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) == STREAM_BATCH_SIZE:
+                    yield "".join(json.dumps(row, default=str) + "\n" for row in serialize_docs(batch, db_name))
+                    batch = []
+            if batch:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in serialize_docs(batch, db_name))
+        finally:
+            cursor.close()
 
-    return ordered_doc
+    return Response(generate(), mimetype="application/x-ndjson")
 
 
 @data_handler_api.route("/api/data_query", methods=["GET"])
 def data_query():
     """
-    Backwards-compatible query for intraday / periodic_summary that uses offset-based pagination.
-    Kept for older code paths (not the cursor-based collection_data).
+    Query for intraday / periodic_summary, ordered by (Datetime, _id).
+    - after=<Datetime|_id>: keyset page starting after that row (use next_after from the previous page)
+    - page=N: page-number compatibility; served by keyset when page N-1 was just read, else skip()
+    - stream=1: the whole filtered result as NDJSON, no paging
     """
     db_name = request.args.get("db")  # intraday or periodic_summary
     ticker = request.args.get("ticker")
     stock_id = request.args.get("stock_id")
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 20))
+    after = request.args.get("after")
+    stream = request.args.get("stream") == "1"
     skip = (page - 1) * limit
 
     if db_name not in ("intraday", "periodic_summary"):
@@ -152,7 +170,6 @@ def data_query():
         next_day = date_obj + timedelta(days=1)
         query["Datetime"] = {"$gte": date_obj, "$lt": next_day}
         collection = db["intraday"]
-        sort_key = "Datetime"
     else:
         datetime_str = request.args.get("datetime")
         if datetime_str:
@@ -168,16 +185,36 @@ def data_query():
                     return jsonify({"error": "Invalid datetime format."}), 400
                 query["Datetime"] = dt_obj
         collection = db["periodic_summary"]
-        sort_key = "Datetime"
 
-    total = collection.count_documents(query)
-    cursor = (
-        collection.find(query)
-        .sort(sort_key, 1)
+    if stream:
+        return stream_ndjson(collection, query, db_name)
+
+    # Page N's keyset start is the last row of page N-1 (remembered when that page was served)
+    page_key = (db_name, repr(query), limit)
+    if not after and page > 1:
+        after = _page_cursors.get(page_key + (page,))
+
+    page_query = query
+    if after:
+        try:
+            page_query = {"$and": [query, keyset_filter(*parse_keyset_cursor(after))]}
+        except Exception:
+            return jsonify({"error": "Invalid after cursor, expected 'datetime|objectid'"}), 400
+        skip = 0
+
+    total, _ = cached_total(db_name, query)
+    docs = list(
+        collection.find(page_query)
+        .sort([("Datetime", ASCENDING), ("_id", ASCENDING)])
         .skip(skip)
-        .limit(limit)
+        .limit(limit + 1)
     )
-    data = [serialize_doc(x, db_name=db_name) for x in cursor]
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_after = keyset_token(docs[-1]) if has_more else None
+    if next_after and not request.args.get("after"):
+        _remember_page_cursor(page_key + (page + 1,), next_after)
+    data = serialize_docs(docs, db_name)
 
     return jsonify(
         {
@@ -189,44 +226,126 @@ def data_query():
             "limit": limit,
             "page": page,
             "pages": (total + limit - 1) // limit,
+            "has_more": has_more,
+            "next_after": next_after,
             "data": data,
         }
     )
 
 
+def _mb(value):
+    return round((value or 0) / (1024 * 1024), 2)
+
+
+def probe_collection(cname):
+    """Overview entry for one collection: estimated count, collstats sizes, first/last Datetime."""
+    col = db[cname]
+    count = col.estimated_document_count()
+    entry = {"collection": cname, "count": count}
+    try:
+        stats = db.command("collstats", cname)
+        entry.update({
+            "size_mb": _mb(stats.get("size")),
+            "storage_size_mb": _mb(stats.get("storageSize")),
+            "index_size_mb": _mb(stats.get("totalIndexSize")),
+            "index_sizes_mb": {name: _mb(size) for name, size in (stats.get("indexSizes") or {}).items()},
+            "avg_obj_size_bytes": stats.get("avgObjSize"),
+        })
+    except Exception:
+        entry.update({"size_mb": "N/A", "storage_size_mb": "N/A", "index_size_mb": "N/A",
+                      "index_sizes_mb": {}, "avg_obj_size_bytes": None})
+
+    first_dt = None
+    last_dt = None
+    if cname not in NO_DATETIME_COLLECTIONS and count:
+        # First and last by Datetime field only (skip BSON/ObjectId logic)
+        query = {"Datetime": {"$exists": True}}
+        first_doc = col.find_one(query, {"_id": 0, "Datetime": 1}, sort=[("Datetime", ASCENDING)])
+        last_doc = col.find_one(query, {"_id": 0, "Datetime": 1}, sort=[("Datetime", DESCENDING)])
+        first_dt = first_doc.get("Datetime") if first_doc else None
+        last_dt = last_doc.get("Datetime") if last_doc else None
+    entry["first_datetime_ist"] = utc_to_ist(first_dt)
+    entry["last_datetime_ist"] = utc_to_ist(last_dt)
+    return entry
+
+
 @data_handler_api.route("/api/db/collections_overview", methods=["GET"])
 def get_collections_overview():
-    overview = []
-    for cname in COLLECTIONS:
-        col = db[cname]
-        count = col.count_documents({})
-        try:
-            stats = db.command("collstats", cname)
-            size = round(stats.get("size", 0) / (1024 * 1024), 2)
-        except Exception:
-            size = "N/A"
-
-        # Get first and last by Datetime field only (skip BSON/ObjectId logic)
-        first_doc = col.find({"Datetime": {"$exists": True}}).sort("Datetime", ASCENDING).limit(1)
-        last_doc = col.find({"Datetime": {"$exists": True}}).sort("Datetime", DESCENDING).limit(1)
-        first_dt = None
-        last_dt = None
-
-        for d in first_doc:
-            first_dt = d.get("Datetime")
-        for d in last_doc:
-            last_dt = d.get("Datetime")
-
-        overview.append(
-            {
-                "collection": cname,
-                "count": count,
-                "size_mb": size,
-                "first_datetime_ist": utc_to_ist(first_dt),
-                "last_datetime_ist": utc_to_ist(last_dt),
-            }
-        )
-    return jsonify(overview)
+    """
+    Per-collection counts, sizes and Datetime range, probed concurrently and cached
+    for OVERVIEW_TTL_SECONDS. refresh=1 forces a recomputation.
+    """
+    refresh = request.args.get("refresh") == "1"
+    cache = _overview_cache
+    if refresh or cache["data"] is None or time.monotonic() >= cache["expires_at"]:
+        with _overview_lock:
+            if refresh or cache["data"] is None or time.monotonic() >= cache["expires_at"]:
+                with ThreadPoolExecutor(max_workers=len(COLLECTIONS)) as executor:
+                    overview = list(executor.map(probe_collection, COLLECTIONS))
+                cache.update({"data": overview, "expires_at": time.monotonic() + OVERVIEW_TTL_SECONDS})
+    return jsonify(cache["data"])
+
+
+@data_handler_api.route("/api/db/indexes", methods=["GET", "POST"])
+def get_index_report():
+    """
+    Declared vs existing indexes (with $indexStats usage) per collection, and the
+    winning plan of each hot query shape. POST creates missing indexes first.
+    """
+    if request.method == "POST":
+        index_manager.reconcile_all()
+    collections = list(dict.fromkeys(COLLECTIONS + list(index_manager.INDEX_SPECS)))
+    with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+        reports = list(executor.map(index_manager.index_report, collections))
+    return jsonify({
+        "collections": dict(zip(collections, reports)),
+        "query_plans": index_manager.query_plan_report(),
+    })
+
+
+def collection_has_datetime(cname):
+    """Whether documents of cname carry Datetime (probed once per SCHEMA_TTL_SECONDS)."""
+    now = time.monotonic()
+    cached = _schema_cache.get(cname)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    if cname in NO_DATETIME_COLLECTIONS:
+        has_datetime = False
+    else:
+        has_datetime = db[cname].find_one({"Datetime": {"$exists": True}}, {"_id": 1}) is not None
+    with _cache_lock:
+        _schema_cache[cname] = (now + SCHEMA_TTL_SECONDS, has_datetime)
+    return has_datetime
+
+
+def cached_total(cname, base_filter, approx=False):
+    """
+    (total, approximate) for base_filter, cached for COUNT_TTL_SECONDS.
+    approx: collection statistics when unfiltered, else a count capped at APPROX_COUNT_LIMIT.
+    """
+    key = (cname, repr(base_filter), approx)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _count_cache.get(key)
+        if cached is not None and cached[0] > now:
+            _count_cache.move_to_end(key)
+            return cached[1]
+
+    col = db[cname]
+    if approx and not base_filter:
+        result = (col.estimated_document_count(), True)
+    elif approx:
+        total = col.count_documents(base_filter, limit=APPROX_COUNT_LIMIT)
+        result = (total, total >= APPROX_COUNT_LIMIT)
+    else:
+        result = (col.count_documents(base_filter), False)
+
+    with _cache_lock:
+        _count_cache[key] = (now + COUNT_TTL_SECONDS, result)
+        _count_cache.move_to_end(key)
+        while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.popitem(last=False)
+    return result
 
 
 @data_handler_api.route("/api/db/collection_data", methods=["GET"])
@@ -240,6 +359,8 @@ def get_collection_data():
       - direction: 'next' (default) or 'prev'
       - date: YYYY-MM-DD (applies to collections that have Datetime, e.g. historical/intraday)
       - other filters (exact match) are supported (e.g. ticker=XXX)
+      - format: rows (default) | columns | msgpack | arrow, or negotiated from the Accept header
+      - approx_total: 1 -> total from collection statistics (unfiltered) or a capped count
     Response:
       {
         "collection": cname,
@@ -247,21 +368,25 @@ def get_collection_data():
         "cursor": "<cursor for next page or null>",
         "limit": limit,
         "has_more": bool,
-        "total": total_count_base_filters
+        "total": total_count_base_filters,
+        "total_approximate": bool
       }
     """
     cname = request.args.get("collection")
     limit = min(int(request.args.get("limit", 50)), 100)  # safety cap
     cursor_value = request.args.get("cursor")  # expecting 'datetime|objectid' or just objectid
     direction = request.args.get("direction", "next")  # "next" or "prev"
+    output_format = response_formats.negotiate_format()
 
     if cname not in COLLECTIONS:
         return jsonify({"error": "Invalid collection"}), 400
+    if output_format is None:
+        return response_formats.unknown_format_error()
 
     col = db[cname]
 
     # Determine if this collection uses Datetime for sorting
-    has_datetime = col.find_one({"Datetime": {"$exists": True}}) is not None
+    has_datetime = collection_has_datetime(cname)
     sort_order = 1 if direction == "next" else -1
 
     if has_datetime:
@@ -281,7 +406,7 @@ def get_collection_data():
         base_filter["Datetime"] = {"$gte": date_obj, "$lt": next_day}
 
     # Add other non-pagination filters from query args (exact matches)
-    exclude_keys = {"collection", "limit", "cursor", "direction", "date"}
+    exclude_keys = {"collection", "limit", "cursor", "direction", "date", "format", "approx_total"}
     for k, v in request.args.items():
         if k in exclude_keys:
             continue
@@ -292,10 +417,10 @@ def get_collection_data():
 
     # Compute total count using base_filter only (so total stays stable across pages)
     try:
-        total_count = col.count_documents(base_filter)
+        total_count, total_approximate = cached_total(cname, base_filter, approx=request.args.get("approx_total") == "1")
     except Exception:
         # fallback: 0
-        total_count = 0
+        total_count, total_approximate = 0, False
 
     # --- Build pagination filter separately and combine with base_filter for query ---
     pagination_filter = {}
@@ -358,7 +483,7 @@ def get_collection_data():
         docs = docs[:limit]
 
     # Serialize docs for frontend and ensure _id is present as string
-    result_docs = [serialize_doc(d, db_name=cname) for d in docs]
+    result_docs = serialize_docs(docs, cname)
 
     # Prepare next-cursor only if there's more
     next_cursor = None
@@ -382,13 +507,18 @@ def get_collection_data():
         # For previous page requests we reversed the sort order; to keep chronological display, reverse the result docs
         result_docs.reverse()
 
-    return jsonify(
-        {
-            "collection": cname,
-            "data": result_docs,
-            "cursor": next_cursor,
-            "limit": limit,
-            "has_more": has_more,
-            "total": total_count,
-        }
-    )
+    payload = {
+        "collection": cname,
+        "data": result_docs,
+        "cursor": next_cursor,
+        "limit": limit,
+        "has_more": has_more,
+        "total": total_count,
+        "total_approximate": total_approximate,
+    }
+    if output_format == "rows":
+        return jsonify(payload)
+    # columns / msgpack: data as {field: [values]}; arrow: data as the table, the rest as metadata
+    payload["data"] = response_formats.to_columns(result_docs)
+    meta = {k: v for k, v in payload.items() if k != "data"}
+    return response_formats.make_response(output_format, payload, table=payload["data"], meta=meta)
@@ -1,39 +1,51 @@
-from flask import Blueprint, request, jsonify
+import os
+import re
+from flask import Blueprint, request, jsonify, Response
 from datetime import datetime, time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import OperationFailure
 from mongo_client import non_flask_db as db
+import downsample
 from stock_utility import StockUtility
-import os
+from stock_registry import get_stock_registry
+from market_calendar import get_market_calendar
+from response_cache import get_response_cache
+import response_formats
 import pytz
 
 stock_util = StockUtility()
 display_chart_api = Blueprint("display_chart_api", __name__)
 
-def load_stocks(file_path="/shared/stocks_list.txt"):
-    if not os.path.exists(file_path):
-        return {}
-    
-    stock_dict = {}
-    with open(file_path, "r") as f:
-        lines = [line.strip() for line in f if line.strip()]
-        for line in lines:
-            if line.lower().startswith("id"):
-                continue
-            parts = line.split(",")
-            if len(parts) >= 3:
-                try:
-                    stock_id = int(parts[0].strip())
-                    ticker = parts[2].strip()
-                    stock_dict[ticker] = stock_id
-                except ValueError:
-                    continue
-    return stock_dict
-
-STOCK_MAP = load_stocks()
-ID_TO_TICKER = {v: k for k, v in STOCK_MAP.items()}
+stock_registry = get_stock_registry()
 
 IST = pytz.timezone("Asia/Kolkata")
 UTC = pytz.utc
 
+# Shared, bounded pool for the per-request collection reads (4 per request)
+CHART_QUERY_WORKERS = 16
+_query_executor = ThreadPoolExecutor(max_workers=CHART_QUERY_WORKERS, thread_name_prefix="display-chart")
+
+# Only the fields each section of the response emits
+HISTORICAL_FIELDS = {"_id": 0, "Datetime": 1, "Open": 1, "High": 1, "Low": 1, "Close": 1, "Volume": 1,
+                     "profit_percent": 1, "profit_value": 1, "status": 1}
+INTRADAY_FIELDS = {"_id": 0, "Datetime": 1, "Open": 1, "High": 1, "Low": 1, "Close": 1, "Volume": 1}
+PERIODIC_FIELDS = {"_id": 0, "Datetime": 1, "signal": 1, "type": 1, "position_type": 1, "score": 1}
+# open_positions entries are passed through whole (minus _id)
+POSITION_FIELDS = {"_id": 0}
+
+# Row-array sections of the response (columnar in format=columns/msgpack, one per Arrow stream)
+CHART_SECTIONS = ("historical", "intraday", "periodic_summary", "open_positions")
+
+# Whether the server accepts $dateTrunc (MongoDB 5.0+); None until first tried
+_DATE_TRUNC_SUPPORTED = None
+# Upper bound accepted for max_points=
+MAX_POINTS_LIMIT = 20000
+
+# Serialized responses: ranges of closed sessions are kept until evicted, ranges reaching today for a short TTL
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+CHART_CACHE_LIVE_TTL_SECONDS = 15
+chart_cache = get_response_cache("display_chart", CHART_CACHE_MAX_BYTES)
+
 def to_ist_iso(dt):
     """Convert a datetime (naive or tz-aware) to IST and return ISO string with offset."""
     if dt is None:
@@ -50,6 +62,122 @@ def to_utc_datetime(dt):
         dt = dt.replace(tzinfo=UTC)
     return dt.astimezone(UTC)
 
+def find_sorted(collection, query, projection):
+    """Documents of `collection` matching `query`, projected and sorted by Datetime."""
+    return list(db[collection].find(query, projection).sort("Datetime", 1))
+
+def fetch_intraday_buckets(query, resolution):
+    """Intraday bars of `query` bucketed to `resolution` (OHLCV) in Mongo."""
+    global _DATE_TRUNC_SUPPORTED
+    if _DATE_TRUNC_SUPPORTED is not False:
+        try:
+            docs = list(db["intraday"].aggregate(downsample.ohlcv_bucket_pipeline(query, resolution)))
+            _DATE_TRUNC_SUPPORTED = True
+            return docs
+        except OperationFailure as e:
+            print(f"[⚠️] $dateTrunc unavailable, falling back to epoch bucketing: {e}")
+            _DATE_TRUNC_SUPPORTED = False
+    return list(db["intraday"].aggregate(downsample.ohlcv_bucket_pipeline(query, resolution, use_date_trunc=False)))
+
+def fetch_chart_docs(stock_id, ticker, start_utc, end_utc, resolution=None, since=None):
+    """
+    Run the four chart reads concurrently; returns {collection: [docs]}.
+    Intraday bars are bucketed server-side when `resolution` is set.
+    `since` maps a section to its cursor: only rows newer than it are read for that
+    section (positions: opened, bought or sold after it); bucketed intraday restarts
+    at the bucket holding its cursor.
+    """
+    since = since or {}
+    query = {"stock_id": int(stock_id), "ticker": ticker, "Datetime": {"$gte": start_utc, "$lte": end_utc}}
+    start_day_utc = start_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+    positions_query = {"stock_id": stock_id, "ticker": ticker, "Datetime": {"$gte": start_day_utc, "$lte": end_utc}}
+
+    def newer_than(section):
+        cursor = since.get(section)
+        return query if cursor is None else dict(query, Datetime={"$gt": cursor, "$lte": end_utc})
+
+    intraday_query = newer_than("intraday")
+    if since.get("intraday") is not None and resolution not in downsample.RAW_RESOLUTIONS:
+        intraday_query = dict(query, Datetime={"$gte": downsample.bucket_start(since["intraday"], resolution), "$lte": end_utc})
+    if since.get("open_positions") is not None:
+        cursor = since["open_positions"]
+        positions_query["$or"] = [{"Datetime": {"$gt": cursor}}, {"buy_time": {"$gt": cursor}}, {"sell_time": {"$gt": cursor}}]
+    futures = {
+        "historical": _query_executor.submit(find_sorted, "historical", newer_than("historical"), HISTORICAL_FIELDS),
+        "intraday": (
+            _query_executor.submit(find_sorted, "intraday", intraday_query, INTRADAY_FIELDS)
+            if resolution in downsample.RAW_RESOLUTIONS
+            else _query_executor.submit(fetch_intraday_buckets, intraday_query, resolution)
+        ),
+        "periodic_summary": _query_executor.submit(find_sorted, "periodic_summary", newer_than("periodic_summary"), PERIODIC_FIELDS),
+        "open_positions": _query_executor.submit(find_sorted, "open_positions", positions_query, POSITION_FIELDS),
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+def summary_signal(doc):
+    return doc.get("signal") or doc.get("type") or doc.get("position_type")
+
+def normalize_dt_field(dt_field):
+    if not dt_field:
+        return None
+    if isinstance(dt_field, dict) and "$date" in dt_field:
+        dt_obj = datetime.fromisoformat(dt_field["$date"].replace("Z", "+00:00"))
+    elif isinstance(dt_field, str):
+        dt_obj = datetime.fromisoformat(dt_field.replace("Z", "+00:00"))
+    else:
+        dt_obj = dt_field
+    return to_utc_datetime(dt_obj) if dt_obj else None
+
+def parse_since(value):
+    """since= as an aware UTC datetime; naive values are read as IST."""
+    # An unescaped "+" in the query string arrives as a space
+    value = re.sub(r" (\d{2}:?\d{2})$", r"+\1", value.strip())
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = IST.localize(dt)
+    return dt.astimezone(UTC)
+
+def _section_times(section, docs):
+    if section == "intraday":
+        return [to_utc_datetime(doc.get("LastDatetime") or doc.get("Datetime")) for doc in docs]
+    if section == "open_positions":
+        return [normalize_dt_field(doc.get(field)) for doc in docs for field in ("Datetime", "buy_time", "sell_time")]
+    return [to_utc_datetime(doc.get("Datetime")) for doc in docs]
+
+def chart_watermarks(docs, since=None):
+    """
+    Returns ({section: watermark}, watermark). A section's watermark is the newest time
+    covered by its fetched docs (UTC), never older than its cursor in `since`. The single
+    watermark, for clients polling with one since=, is the oldest of those newest times
+    over the sections that returned rows (the oldest cursor when none did), so passing it
+    back never skips a section's rows.
+    """
+    since = since or {}
+    watermarks, newest = {}, []
+    for section in CHART_SECTIONS:
+        times = [t for t in _section_times(section, docs[section]) if isinstance(t, datetime)]
+        if times:
+            newest.append(max(times))
+        cursors = times + ([since[section]] if since.get(section) is not None else [])
+        watermarks[section] = max(cursors) if cursors else None
+    cursors = [t for t in since.values() if t is not None]
+    watermark = min(newest) if newest else (min(cursors) if cursors else None)
+    return watermarks, watermark
+
+def is_closed_range(end_ist):
+    """True when every trading session up to end_ist's day has closed (it ends before today IST)."""
+    today = datetime.now(IST).date()
+    return get_market_calendar().last_trading_day(end_ist.date()) < today
+
+def cached_response(entry):
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    response.headers["Vary"] = "Accept"
+    return response
+
 @display_chart_api.route("/api/display_chart", methods=["GET"])
 def display_chart():
     try:
@@ -58,7 +186,28 @@ def display_chart():
         end_date = request.args.get("end_date")
         stock_id_param = request.args.get("stock_id")
         target_datetime = request.args.get("target_datetime")
+        resolution = request.args.get("resolution")
+        max_points = request.args.get("max_points")
+        since = request.args.get("since")
+        output_format = response_formats.negotiate_format()
+        section = request.args.get("section", "intraday")
+
+        if output_format is None:
+            return response_formats.unknown_format_error()
+        if output_format == "arrow" and section not in CHART_SECTIONS:
+            return jsonify({"error": f"section must be one of: {', '.join(CHART_SECTIONS)}"}), 400
+        if resolution not in downsample.RAW_RESOLUTIONS and resolution not in downsample.RESOLUTIONS:
+            allowed = ", ".join(["1m"] + list(downsample.RESOLUTIONS))
+            return jsonify({"error": f"resolution must be one of: {allowed}"}), 400
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+            except ValueError:
+                return jsonify({"error": "max_points must be an integer"}), 400
+            if not 3 <= max_points <= MAX_POINTS_LIMIT:
+                return jsonify({"error": f"max_points must be between 3 and {MAX_POINTS_LIMIT}"}), 400
 
+        stocks = stock_registry.snapshot()
         stock_id = None
         if stock_id_param:
             try:
@@ -66,14 +215,31 @@ def display_chart():
             except ValueError:
                 return jsonify({"error": "stock_id must be an integer"}), 400
             if not ticker:
-                ticker = ID_TO_TICKER.get(stock_id)
+                ticker = stocks.id_to_ticker.get(stock_id)
                 if not ticker:
                     return jsonify({"error": f"ticker not found for stock_id={stock_id}"}), 404
 
         if ticker and not stock_id:
-            if ticker not in STOCK_MAP:
+            if ticker not in stocks.ticker_to_id:
                 return jsonify({"error": f"{ticker} not found in stocks list"}), 404
-            stock_id = STOCK_MAP[ticker]
+            stock_id = stocks.ticker_to_id[ticker]
+
+        # since= is the cursor of every section; since_<section>= overrides it for one section
+        try:
+            since = parse_since(since) if since else None
+            section_since = {}
+            for name in CHART_SECTIONS:
+                value = request.args.get(f"since_{name}")
+                section_since[name] = parse_since(value) if value else since
+        except ValueError:
+            return jsonify({"error": "Invalid since. Use an ISO 8601 datetime, e.g. 2025-01-06T10:15:00+05:30."}), 400
+        cursors = [t for t in section_since.values() if t is not None]
+        if not cursors:
+            section_since = None
+        elif not start_date and not target_datetime:
+            # Incremental polls default to the range from the oldest cursor's day through today
+            start_date = min(cursors).astimezone(IST).strftime("%Y-%m-%d")
+            end_date = end_date or datetime.now(IST).strftime("%Y-%m-%d")
 
         if not start_date and target_datetime:
             start_date = target_datetime
@@ -95,14 +261,27 @@ def display_chart():
         except ValueError:
             return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
 
-        # Fetch historical data
-        historical_docs = list(db["historical"].find({
-            "stock_id": int(stock_id),
-            "ticker": ticker,
-            "Datetime": {"$gte": start_utc, "$lte": end_utc}
-        }).sort("Datetime", 1))
+        # Full-range responses are served from the chart cache; since= polls always go to Mongo
+        cache_key = None
+        if section_since is None:
+            normalized_resolution = resolution if resolution not in downsample.RAW_RESOLUTIONS else "1m"
+            cache_key = (stock_id, ticker, start_ist.date(), end_ist.date(), normalized_resolution, max_points,
+                         output_format, section if output_format == "arrow" else None)
+            entry = chart_cache.get(cache_key)
+            if entry is not None:
+                return cached_response(entry)
+
+        # Fetch historical, intraday, periodic summary and open positions in parallel
+        docs = fetch_chart_docs(stock_id, ticker, start_utc, end_utc, resolution, section_since)
+        watermarks, watermark = chart_watermarks(docs, section_since)
+        if max_points:
+            # LTTB on the close line for bars, signal changes + LTTB on score for summaries
+            docs["historical"] = downsample.lttb(docs["historical"], max_points)
+            docs["intraday"] = downsample.lttb(docs["intraday"], max_points)
+            docs["periodic_summary"] = downsample.reduce_signals(docs["periodic_summary"], max_points, signal_of=summary_signal)
+
         historical_data = []
-        for doc in historical_docs:
+        for doc in docs["historical"]:
             dt = doc.get("Datetime")
             historical_data.append({
                 "datetime": to_ist_iso(dt),
@@ -116,14 +295,8 @@ def display_chart():
                 "status": doc.get("status")
             })
 
-        # Fetch intraday data
-        intraday_docs = list(db["intraday"].find({
-            "stock_id": int(stock_id),
-            "ticker": ticker,
-            "Datetime": {"$gte": start_utc, "$lte": end_utc}
-        }).sort("Datetime", 1))
         intraday_data = []
-        for doc in intraday_docs:
+        for doc in docs["intraday"]:
             dt = doc.get("Datetime")
             intraday_data.append({
                 "datetime": to_ist_iso(dt),
@@ -134,48 +307,24 @@ def display_chart():
                 "volume": doc.get("Volume")
             })
 
-        # Fetch periodic summary
-        periodic_docs = list(db["periodic_summary"].find({
-            "stock_id": int(stock_id),
-            "ticker": ticker,
-            "Datetime": {"$gte": start_utc, "$lte": end_utc}
-        }).sort("Datetime", 1))
         periodic_data = []
-        for doc in periodic_docs:
+        for doc in docs["periodic_summary"]:
             dt = doc.get("Datetime")
             periodic_data.append({
                 "datetime": to_ist_iso(dt),
-                "signal": doc.get("signal") or doc.get("type") or doc.get("position_type"),
+                "signal": summary_signal(doc),
                 "score": doc.get("score")
             })
 
-        # Fetch open positions and normalize
-        start_day_utc = start_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-        open_pos_docs = list(db["open_positions"].find({
-            "stock_id": stock_id,
-            "ticker": ticker,
-            "Datetime": {"$gte": start_day_utc, "$lte": end_utc}
-        }).sort("Datetime", 1))
-
+        # Normalize open positions
         positions_data = []
         # Get intraday profit data if requested
         intraday_profit_percent = None
         intraday_profit_value = None
         profit_error = None
 
-        def normalize_dt_field(dt_field):
-            if not dt_field:
-                return None
-            if isinstance(dt_field, dict) and "$date" in dt_field:
-                dt_obj = datetime.fromisoformat(dt_field["$date"].replace("Z", "+00:00"))
-            elif isinstance(dt_field, str):
-                dt_obj = datetime.fromisoformat(dt_field.replace("Z", "+00:00"))
-            else:
-                dt_obj = dt_field
-            return to_utc_datetime(dt_obj) if dt_obj else None
-
-        for doc in open_pos_docs:
-            position_entry = {k: v for k, v in doc.items() if k != "_id"}
+        for doc in docs["open_positions"]:
+            position_entry = dict(doc)
 
             # Normalize buy_time
             buy_time = normalize_dt_field(doc.get("buy_time") or doc.get("Datetime"))
@@ -219,6 +368,10 @@ def display_chart():
             "ticker": ticker,
             "stock_id": stock_id,
             "date_range": {"from": start_ist_iso, "to": end_ist_iso},
+            "resolution": resolution if resolution not in downsample.RAW_RESOLUTIONS else "1m",
+            "since": to_ist_iso(since),
+            "watermark": to_ist_iso(watermark),
+            "watermarks": {name: to_ist_iso(t) for name, t in watermarks.items()},
             "intraday_profit_percent": intraday_profit_percent,
             "intraday_profit_value": intraday_profit_value,
             "historical": historical_data,
@@ -229,7 +382,26 @@ def display_chart():
         if profit_error:
             response["intraday_profit_error"] = profit_error
 
-        return jsonify(response)
+        # rows: the original JSON; columns/msgpack: each section as {field: [values]};
+        # arrow: one section as a table, the other top-level fields in the schema metadata
+        if output_format != "rows":
+            response.update({name: response_formats.to_columns(response[name]) for name in CHART_SECTIONS})
+        table = response[section] if output_format == "arrow" else None
+        meta = {k: v for k, v in response.items() if k not in CHART_SECTIONS} if output_format == "arrow" else None
+        if cache_key is None:
+            return response_formats.make_response(output_format, response, table, meta)
+        try:
+            body, mimetype = response_formats.encode_body(output_format, response, table, meta)
+        except response_formats.FormatUnavailable as e:
+            return jsonify({"error": str(e)}), 406
+        ttl = None if is_closed_range(end_ist) else CHART_CACHE_LIVE_TTL_SECONDS
+        entry = chart_cache.put(cache_key, body, ttl=ttl, mimetype=mimetype)
+        return cached_response(entry)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@display_chart_api.route("/api/display_chart/cache_stats", methods=["GET"])
+def display_chart_cache_stats():
+    """Hit / miss / eviction counters and byte usage of the chart response cache."""
+    return jsonify(chart_cache.stats())
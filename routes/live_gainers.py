@@ -2,13 +2,21 @@ from flask import Blueprint, jsonify
 from stock_utility import StockUtility
 from mongo_client import non_flask_db as db
 from pymongo import DESCENDING
-import os
+from stock_registry import get_stock_registry
+import latest_summary
 from datetime import datetime, timedelta, timezone
+import threading
+import time
 import pytz
 
 live_gainers_api = Blueprint("live_gainers_api", __name__)
 su = StockUtility()
 
+# /api/live_profit is rebuilt at most once per LIVE_PROFIT_TTL_SECONDS for all clients
+LIVE_PROFIT_TTL_SECONDS = 10
+_live_profit_cache = {"expires_at": 0, "universe": None, "stocks": None}
+_live_profit_lock = threading.Lock()
+
 def convert_to_ist(dt):
     if dt is None:
         return None
@@ -19,40 +27,73 @@ def convert_to_ist(dt):
         dt = utc.localize(dt)
     return dt.astimezone(ist)
 
-def load_stocks_from_file(file_path="/shared/stocks_list.txt"):
-    if not os.path.exists(file_path):
-        return {}
-
-    stock_dict = {}
-    with open(file_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.lower().startswith("id"):
-                continue
-            
-            parts = line.split(",")
-            if len(parts) >= 3:
-                try:
-                    stock_id = int(parts[0].strip())
-                    ticker = parts[2].strip()
-                    stock_dict[stock_id] = ticker
-                except ValueError:
-                    continue
-    return stock_dict
-def fetch_latest_periodic_summaries(stock_ids, tickers):
-    # Aggregation pipeline for latest entry per (stock_id, ticker)
-    pipeline = [
-        {"$match": {
-            "stock_id": {"$in": [int(sid) for sid in stock_ids]},
-            "ticker": {"$in": tickers}
-        }},
-        {"$sort": {"Datetime": -1}},
-        {"$group": {
-            "_id": {"stock_id": "$stock_id", "ticker": "$ticker"},
-            "doc": {"$first": "$$ROOT"}
-        }}
-    ]
-    return list(db["periodic_summary"].aggregate(pipeline, allowDiskUse=True))
+def load_stocks_from_file(file_path=None):
+    """stock_id -> ticker mapping from the shared StockRegistry snapshot."""
+    return get_stock_registry(file_path).snapshot().id_to_ticker
+
+def format_gainer(doc):
+    """Live gainers entry for a (latest) periodic_summary row."""
+    ticker = doc.get("ticker", "")
+    return {
+        "symbol": ticker.replace(".NS", ""),
+        "price": doc.get("Close"),
+        "volume": doc.get("Volume"),
+        "change": doc.get("profit_percent"),
+        "profit": doc.get("profit_amount"),
+        "profit_percent": doc.get("profit_percent"),
+        "signal": doc.get("signal", "HOLD")
+    }
+
+def fetch_today_positions():
+    """Today's open_positions documents (UTC day), newest buy first."""
+    # Get current date range in UTC (since MongoDB stores datetime in UTC)
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = datetime.now(timezone.utc).replace(hour=23, minute=59, second=59, microsecond=0)
+
+    # Fetch documents for current day only
+    cursor = db["open_positions"].find({
+        "Datetime": {"$gte": today, "$lt": tomorrow}
+    }).sort("buy_time", DESCENDING)
+    return list(cursor)
+
+def safe_dt(value):
+    # Parse safe date/time fields
+    if isinstance(value, dict) and "$date" in value:
+        return value["$date"]
+    return value
+
+def format_position(doc):
+    """Live positions entry for an open_positions document; None for signals other than BUY/CLOSED."""
+    signal = doc.get("signal", "").upper()
+    ticker = doc.get("ticker", "")
+    base_entry = {
+        "ticker": ticker,
+        "symbol": ticker.replace(".NS", ""),
+        "stock_id": doc.get("stock_id"),
+        "reason": doc.get("reason", ""),
+    }
+
+    if signal == "BUY":
+        return {
+            **base_entry,
+            "buy_time": convert_to_ist(doc.get("buy_time")),
+            "buy_price": doc.get("buy_price"),
+            "sell_time": None,
+            "sell_price": None,
+            "profit_pct": None,
+            "signal": signal,
+        }
+    elif signal == "CLOSED":
+        return {
+            **base_entry,
+            "buy_time": convert_to_ist(safe_dt(doc.get("buy_time"))),
+            "buy_price": doc.get("buy_price"),
+            "sell_time": convert_to_ist(doc.get("sell_time")),
+            "sell_price": doc.get("sell_price"),
+            "profit_pct": doc.get("profit_pct"),
+            "signal": "SELL",
+        }
+    return None
 
 @live_gainers_api.route("/api/live_intraday_gainers", methods=['GET'])
 def get_live_intraday_gainers():
@@ -61,23 +102,9 @@ def get_live_intraday_gainers():
         if not stocks:
             return jsonify({"stocks": []})
 
-        # Use .items() to get (stock_id, ticker) pairs
-        stock_ids, tickers = zip(*stocks.items())
-        latest_docs = fetch_latest_periodic_summaries(stock_ids, tickers)
-
-        results = []
-        for entry in latest_docs:
-            doc = entry["doc"]
-            ticker = doc.get("ticker", "")
-            results.append({
-                "symbol": ticker.replace(".NS", ""),
-                "price": doc.get("Close"),
-                "volume": doc.get("Volume"),
-                "change": doc.get("profit_percent"),
-                "profit": doc.get("profit_amount"),
-                "profit_percent": doc.get("profit_percent"),
-                "signal": doc.get("signal", "HOLD")
-            })
+        # One pre-materialized row per stock instead of sorting periodic_summary
+        latest_docs = latest_summary.fetch_latest(stocks)
+        results = [format_gainer(doc) for doc in latest_docs]
 
         sorted_results = sorted(
             results, key=lambda x: (x["change"] if x["change"] is not None else -999), reverse=True
@@ -90,21 +117,7 @@ def get_live_intraday_gainers():
 @live_gainers_api.route("/api/live_intra_gainers", methods=['GET'])
 def get_live_intra_gainers():
     try:
-        # Connect to open_positions collection
-        collection = db["open_positions"]
-
-        # Get current date range in UTC (since MongoDB stores datetime in UTC)
-        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        #today = datetime(2025, 10, 17, 0, 0, 0, 0, tzinfo=timezone.utc)
-        tomorrow = datetime.now(timezone.utc).replace(hour=23, minute=59, second=59, microsecond=0)
-        #tomorrow = datetime(2025, 10, 17, 23, 0, 0, 0, tzinfo=timezone.utc)
-
-        # Fetch documents for current day only
-        cursor = collection.find({
-            "Datetime": {"$gte": today, "$lt": tomorrow}
-        }).sort("buy_time", DESCENDING)
-
-        open_positions = list(cursor)
+        open_positions = fetch_today_positions()
 
         if not open_positions:
             return jsonify({"stocks": []})
@@ -114,43 +127,13 @@ def get_live_intra_gainers():
         sells = []
 
         for doc in open_positions:
-            signal = doc.get("signal", "").upper()
-            ticker = doc.get("ticker", "")
-            base_entry = {
-                "ticker": ticker,
-                "symbol": ticker.replace(".NS", ""),
-                "stock_id": doc.get("stock_id"),
-                "reason": doc.get("reason", ""),
-            }
-
-            # Parse safe date/time fields
-            def safe_dt(value):
-                if isinstance(value, dict) and "$date" in value:
-                    return value["$date"]
-                return value
-
-            if signal == "BUY":
-                buys.append({
-                    **base_entry,
-                    "buy_time": convert_to_ist(doc.get("buy_time")),
-                    "buy_price": doc.get("buy_price"),
-                    "sell_time": None,
-                    "sell_price": None,
-                    "profit_pct": None,
-                    "signal": signal,
-                })
-                
-            
-            elif signal == "CLOSED":
-                sells.append({
-                    **base_entry,
-                    "buy_time": convert_to_ist(safe_dt(doc.get("buy_time"))),
-                    "buy_price": doc.get("buy_price"),
-                    "sell_time": convert_to_ist(doc.get("sell_time")),
-                    "sell_price": doc.get("sell_price"),
-                    "profit_pct": doc.get("profit_pct"),
-                    "signal": "SELL",
-                })
+            entry = format_position(doc)
+            if entry is None:
+                continue
+            if entry["signal"] == "BUY":
+                buys.append(entry)
+            else:
+                sells.append(entry)
             
         return jsonify({
                     "stocks": buys + sells # unified array for frontend
@@ -159,4 +142,42 @@ def get_live_intra_gainers():
 
     except Exception as e:
         print(f"[❌] Exception in /api/live_intra_gainers: {e}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+def get_live_profits():
+    """Universe-wide live profit entries sorted by change, cached for LIVE_PROFIT_TTL_SECONDS."""
+    universe = get_stock_registry().snapshot()
+    cache = _live_profit_cache
+    if time.monotonic() >= cache["expires_at"] or cache["universe"] is not universe:
+        with _live_profit_lock:
+            if time.monotonic() >= cache["expires_at"] or cache["universe"] is not universe:
+                profits = su.get_live_profit_snapshot(universe.id_to_ticker)
+                stocks = [
+                    {
+                        "symbol": entry["ticker"].replace(".NS", ""),
+                        "stock_id": stock_id,
+                        "ticker": entry["ticker"],
+                        "datetime": convert_to_ist(entry["datetime"]),
+                        "open": entry["open"],
+                        "price": entry["price"],
+                        "volume": entry["volume"],
+                        "change": entry["change"],
+                        "profit": entry["profit"]
+                    }
+                    for stock_id, entry in profits.items()
+                ]
+                stocks.sort(key=lambda x: x["change"], reverse=True)
+                cache.update({
+                    "stocks": stocks,
+                    "universe": universe,
+                    "expires_at": time.monotonic() + LIVE_PROFIT_TTL_SECONDS
+                })
+    return cache["stocks"]
+
+@live_gainers_api.route("/api/live_profit", methods=['GET'])
+def get_live_profit():
+    try:
+        return jsonify({"stocks": get_live_profits()})
+    except Exception as e:
+        print(f"[❌] Exception in /api/live_profit: {e}")
+        return jsonify({"error": str(e)}), 500
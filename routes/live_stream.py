@@ -0,0 +1,187 @@
+import json
+import time
+import queue
+import threading
+from datetime import datetime
+from bson.objectid import ObjectId
+from flask import Blueprint, Response
+import latest_summary
+from stock_registry import get_stock_registry
+from routes.live_gainers import format_gainer, format_position, fetch_today_positions
+
+live_stream_api = Blueprint("live_stream_api", __name__)
+stock_registry = get_stock_registry()
+
+# open_positions is re-scanned by the shared producer at this interval (seconds)
+POSITIONS_POLL_SECONDS = 3
+# Comment line sent to idle clients so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+# Events buffered per client before it is considered too slow and dropped
+CLIENT_QUEUE_SIZE = 256
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def _sse(event, data, event_id=None):
+    payload = json.dumps(data, default=_json_default, separators=(",", ":"))
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {payload}\n\n"
+
+
+class LiveBroadcaster:
+    """
+    One producer for all /api/stream/live clients.
+    Keeps the current gainers / positions state in memory and fans out only the
+    entries that changed, pre-serialized once per event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._gainers = {}
+        self._positions = {}
+        self._seq = 0
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    # ---------- clients ----------
+    def subscribe(self):
+        self.start()
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            # Queue the snapshot before any publish can see the new client
+            client.put_nowait(_sse("snapshot", {
+                "gainers": list(self._gainers.values()),
+                "positions": list(self._positions.values())
+            }, self._seq))
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def _publish(self, event, data):
+        with self._lock:
+            self._seq += 1
+            message = _sse(event, data, self._seq)
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # Too slow: drop it, it gets a fresh snapshot when it reconnects
+                self.unsubscribe(client)
+                try:
+                    client.put_nowait(None)
+                except queue.Full:
+                    pass
+
+    # ---------- producer ----------
+    def on_summaries(self, rows):
+        """latest_summary listener: push changed symbols."""
+        stocks = stock_registry.snapshot().id_to_ticker
+        changed = []
+        for row in rows:
+            if stocks.get(row.get("stock_id")) != row.get("ticker"):
+                continue
+            entry = format_gainer(row)
+            with self._lock:
+                if self._gainers.get(entry["symbol"]) == entry:
+                    continue
+                self._gainers[entry["symbol"]] = entry
+            changed.append(entry)
+        if changed:
+            self._publish("gainers", changed)
+
+    def check_positions(self):
+        """Diff today's open_positions against the last scan and push BUY/CLOSED changes."""
+        current = {}
+        for doc in fetch_today_positions():
+            entry = format_position(doc)
+            if entry is not None:
+                current[str(doc["_id"])] = {"id": str(doc["_id"]), **entry}
+        changed = [entry for pid, entry in current.items() if self._positions.get(pid) != entry]
+        removed = [pid for pid in self._positions if pid not in current]
+        with self._lock:
+            self._positions = current
+        if changed or removed:
+            self._publish("positions", {"changed": changed, "removed": removed})
+
+    def _load_initial(self):
+        stocks = stock_registry.snapshot().id_to_ticker
+        if stocks:
+            entries = [format_gainer(doc) for doc in latest_summary.fetch_latest(stocks)]
+            with self._lock:
+                for entry in entries:
+                    self._gainers.setdefault(entry["symbol"], entry)
+        self.check_positions()
+
+    def _run(self):
+        while True:
+            time.sleep(POSITIONS_POLL_SECONDS)
+            try:
+                self.check_positions()
+            except Exception as e:
+                print(f"[❌] Live stream positions check failed: {e}")
+
+    def start(self):
+        """
+        Load the current state once, synchronously, then start the producer. Clients
+        arriving meanwhile wait here so their first snapshot is never empty.
+        """
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            # Listen first: summaries landing during the load win over it (setdefault)
+            latest_summary.add_listener(self.on_summaries)
+            latest_summary.start_poller()
+            try:
+                self._load_initial()
+            except Exception as e:
+                print(f"[❌] Live stream initial load failed: {e}")
+            threading.Thread(target=self._run, name="live-stream-producer", daemon=True).start()
+            self._started = True
+
+
+broadcaster = LiveBroadcaster()
+
+
+@live_stream_api.route("/api/stream/live", methods=["GET"])
+def stream_live():
+    """
+    Server-Sent Events for live gainers and open positions.
+    Events:
+      - snapshot:  {"gainers": [...], "positions": [...]} once on connect
+      - gainers:   [changed gainer entries]
+      - positions: {"changed": [...], "removed": [position ids]}
+    """
+    client = broadcaster.subscribe()
+
+    def generate():
+        try:
+            while True:
+                try:
+                    message = client.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            broadcaster.unsubscribe(client)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
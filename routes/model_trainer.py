@@ -2,35 +2,54 @@ from flask import Blueprint, jsonify, current_app, request
 import yfinance as yf
 import os
 from mongo_client import non_flask_db as db
+from ohlcv_cache import upstream
+from ticker_meta import get_ticker_meta, get_ticker_meta_entry
 
 model_trainer_api = Blueprint("model_trainer_api", __name__)
 
 @model_trainer_api.route("/api/stock-check/<string:ticker>", methods=["GET"])
 def check_stock_name(ticker):
     """
-    Validate if a ticker exists by fetching minimal info from yfinance.
+    Validate if a ticker exists, using the cached yfinance metadata.
     """
     try:
-        ticker_obj = yf.Ticker(ticker)
-        info = ticker_obj.info
-        # If info is empty dict or missing key, consider invalid
-        if not info or 'regularMarketPrice' not in info:
+        # Invalid = yfinance info empty or missing regularMarketPrice
+        if get_ticker_meta(ticker) is None:
             return jsonify({"success": False, "message": "Invalid stock ticker"}), 404
         return jsonify({"success": True, "message": "Valid stock ticker"})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+@model_trainer_api.route("/api/stock-meta/<string:ticker>", methods=["GET"])
+def get_stock_meta(ticker):
+    """
+    Return cached ticker metadata (name, sector, regularMarketPrice, ...).
+    """
+    try:
+        entry = get_ticker_meta_entry(ticker)
+        if not entry.get("valid"):
+            return jsonify({"success": False, "message": "Invalid stock ticker"}), 404
+        return jsonify({
+            "success": True,
+            "ticker": entry["ticker"],
+            "data": entry["meta"],
+            "fetched_at": entry["fetched_at"].isoformat() if entry.get("fetched_at") else None
+        })
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @model_trainer_api.route("/api/stock-data/<string:ticker>", methods=["GET"])
 def download_stock_data(ticker):
     """
     Download last 7 days 1-minute interval stock data using yfinance,
     delete old CSV if exists, save new CSV, and return success message.
     """
-    try:
+    def _download_and_save():
         data = yf.download(ticker, period="7d", interval="1m", progress=False, auto_adjust=True)
         if data.empty:
-            return jsonify({"success": False, "message": "No data found for ticker"}), 404
+            return None
 
         save_folder = os.path.expanduser("/shared/temp/")
         os.makedirs(save_folder, exist_ok=True)
@@ -45,6 +64,13 @@ def download_stock_data(ticker):
 
         data.to_csv(save_path)
         current_app.logger.info(f"Saved stock data CSV for {ticker} at {save_path}")
+        return save_path
+
+    try:
+        # Concurrent requests for the same ticker share one download + save
+        save_path = upstream.do(("download_7d_1m", ticker.strip().upper()), _download_and_save)
+        if save_path is None:
+            return jsonify({"success": False, "message": "No data found for ticker"}), 404
 
         return jsonify({"success": True, "message": f"Data downloaded and saved to {save_path}"})
     except Exception as e:
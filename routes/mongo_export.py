@@ -1,12 +1,20 @@
 import os
-import pandas as pd
+import csv
 import numpy as np
-from io import BytesIO
+from io import StringIO
 from datetime import datetime, timedelta, timezone
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, Response
 from pymongo import ASCENDING
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from mongo_client import non_flask_db as db
+from response_formats import ARROW_MIMETYPE, FormatUnavailable, arrow_record_batch, arrow_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
 mongo_export = Blueprint("mongo_export", __name__)
 
@@ -18,6 +26,20 @@ ALLOWED_COLLECTIONS = [
     "login"
 ]
 
+# Documents per cursor batch / CSV chunk, and documents sampled at each end of the range to discover the columns
+EXPORT_BATCH_SIZE = 2000
+COLUMN_SAMPLE_SIZE = 500
+# Documents per Arrow record batch (= one Parquet row group)
+COLUMNAR_BATCH_SIZE = 20000
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+PARQUET_MIMETYPE = "application/vnd.apache.parquet"
+# Codecs per columnar format (Arrow IPC has no snappy); the first one is the default
+COMPRESSIONS = {
+    "parquet": ("zstd", "snappy", "none"),
+    "arrow": ("zstd", "lz4", "none"),
+}
+
 # Fields and defaults for periodic_summary auto-repair
 FIELDS = [
     "Adj_Close", "Close", "High", "Low", "Open", "Volume",
@@ -91,7 +113,8 @@ def parse_iso_date(dt_str):
     except Exception:
         return None
 
-def export_collection_range(collection_name, start_date_str, end_date_str):
+def export_query(collection_name, start_date_str, end_date_str):
+    """Validate an export request; returns (date_field, query) after any pre-export repair."""
     if collection_name not in ALLOWED_COLLECTIONS:
         raise ValueError(f"Invalid collection: {collection_name}")
     start_obj = parse_iso_date(start_date_str)
@@ -106,40 +129,237 @@ def export_collection_range(collection_name, start_date_str, end_date_str):
 
     date_field = "login_time" if collection_name == "login" else "Datetime"
     query = {date_field: {"$gte": start_obj, "$lt": end_obj_exclusive}}
-    cursor = db[collection_name].find(query).sort(date_field, 1)
+    return date_field, query
+
+def export_projection(columns):
+    projection = {column: 1 for column in columns}
+    if "_id" not in projection:
+        projection["_id"] = 0
+    return projection
+
+def sample_documents(collection_name, query, date_field, columns=None, sample_size=COLUMN_SAMPLE_SIZE):
+    """
+    The first and last sample_size documents of an export, oldest first (projected to
+    columns when given), so fields added late in the range are sampled too.
+    """
+    projection = export_projection(columns) if columns else None
+    head = list(db[collection_name].find(query, projection).sort(date_field, 1).limit(sample_size))
+    if len(head) < sample_size:
+        return head
+    tail = list(db[collection_name].find(query, projection).sort(date_field, -1).limit(sample_size))
+    return head + tail[::-1]
+
+def discover_columns(sample):
+    """Columns of an export, in first-seen order over the sampled documents."""
+    columns = {}
+    for doc in sample:
+        for key in doc:
+            columns.setdefault(key, None)
+    return list(columns)
 
-    docs = []
-    for d in cursor:
-        d = dict(d)
-        d["_id"] = str(d["_id"]) # Ensure _id is serializable
-        docs.append(d)
+class InvalidExportFields(ValueError):
+    """None of the fields= names occur in the exported range."""
 
-    if not docs:
+def resolve_export_columns(collection_name, query, date_field, columns=None):
+    """
+    (sample, columns) of an export: the sampled documents (projected to `columns` when
+    given) and the columns, discovered from the sample when not given.
+    """
+    sample = sample_documents(collection_name, query, date_field, columns)
+    if not sample:
         raise ValueError(f"No data found in {collection_name} for selected range.")
+    if not columns:
+        return sample, discover_columns(sample)
+    # Projected documents are empty when none of the requested fields exist
+    if not any(sample):
+        raise InvalidExportFields(f"None of the requested fields occur in {collection_name}: {', '.join(columns)}")
+    return sample, columns
+
+def csv_value(value):
+    """Cell text with the same conventions as the former DataFrame.to_csv export."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+def iter_export_batches(collection_name, query, date_field, columns, batch_size=EXPORT_BATCH_SIZE, dropped=None):
+    """
+    Lists of documents (projected to columns) in batch_size batches, oldest first. When a
+    `dropped` set is given, documents are read whole and fields outside columns are added to it.
+    """
+    projection = export_projection(columns) if dropped is None else None
+    known = set(columns)
+    cursor = (
+        db[collection_name].find(query, projection)
+        .sort(date_field, 1)
+        .batch_size(batch_size)
+    )
+    try:
+        batch = []
+        for doc in cursor:
+            if dropped is not None:
+                dropped.update(key for key in doc if key not in known)
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        cursor.close()
+
+def warn_dropped_fields(collection_name, dropped):
+    print(f"[⚠️] Export of {collection_name}: fields missing from the column sample were not exported: "
+          f"{', '.join(sorted(dropped))}")
+
+def export_collection_range(collection_name, start_date_str, end_date_str, columns=None):
+    """
+    Stream a date range of a collection as CSV. Returns (generator of bytes chunks, filename);
+    memory stays bounded by one cursor batch. Columns come from `columns` when given,
+    otherwise from a sample of the range; fields outside the sample are not exported and
+    their names are logged.
+    """
+    date_field, query = export_query(collection_name, start_date_str, end_date_str)
+    discovered = not columns
+    _, columns = resolve_export_columns(collection_name, query, date_field, columns)
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        dropped = set() if discovered else None
+        try:
+            for batch in iter_export_batches(collection_name, query, date_field, columns, dropped=dropped):
+                writer.writerows([csv_value(doc.get(column)) for column in columns] for doc in batch)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        except Exception as e:
+            print(f"[❌] Export of {collection_name} aborted: {e}")
+            raise
+        if dropped:
+            warn_dropped_fields(collection_name, dropped)
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
 
-    df = pd.DataFrame(docs)
-    output = BytesIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
     filename = f"{collection_name}_{start_date_str}_to_{end_date_str}.csv"
-    return output, filename
+    return generate(), filename
+
+class ChunkSink:
+    """Write-only file object whose written bytes are handed out chunk by chunk with take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def export_collection_columnar(collection_name, start_date_str, end_date_str, fmt,
+                               columns=None, compression=None):
+    """
+    Stream a date range of a collection as Parquet or an Arrow IPC stream. Returns
+    (generator of bytes chunks, filename). Each cursor batch of COLUMNAR_BATCH_SIZE
+    documents becomes one record batch / row group. Types come from a sample of the range;
+    a later value that does not fit aborts the export, and fields outside the sample are
+    not exported and their names are logged.
+    """
+    if pa is None:
+        raise FormatUnavailable("pyarrow is not installed on the server")
+    compression = compression or COMPRESSIONS[fmt][0]
+    codec = None if compression == "none" else compression
+    date_field, query = export_query(collection_name, start_date_str, end_date_str)
+    discovered = not columns
+    sample, columns = resolve_export_columns(collection_name, query, date_field, columns)
+    schema = arrow_schema(sample, columns)
+
+    def generate():
+        sink = ChunkSink()
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression=codec or "none")
+        else:
+            writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+        dropped = set() if discovered else None
+        try:
+            for batch in iter_export_batches(collection_name, query, date_field, columns, COLUMNAR_BATCH_SIZE, dropped):
+                writer.write_batch(arrow_record_batch(batch, schema))
+                yield sink.take()
+            if dropped:
+                warn_dropped_fields(collection_name, dropped)
+        except Exception as e:
+            print(f"[❌] Export of {collection_name} aborted: {e}")
+            raise
+        finally:
+            writer.close()
+        yield sink.take()
+
+    filename = f"{collection_name}_{start_date_str}_to_{end_date_str}.{fmt}"
+    return generate(), filename
+
+def parse_fields(fields_str):
+    """fields= as a list of field names (None when not given)."""
+    if not fields_str:
+        return None
+    fields = [f.strip() for f in fields_str.split(",") if f.strip()]
+    return list(dict.fromkeys(fields)) or None
 
 @mongo_export.route("/api/db/export", methods=["GET"])
 def export_and_download():
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
     collection = request.args.get("collection", "periodic_summary")
+    fmt = request.args.get("format", "csv")
+    compression = request.args.get("compression")
+    fields = parse_fields(request.args.get("fields"))
     if not start_date or not end_date:
         return jsonify({"error": "Missing 'start_date' or 'end_date' parameter. Format: YYYY-MM-DD"}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    if compression and compression not in COMPRESSIONS.get(fmt, ()):
+        allowed = ", ".join(COMPRESSIONS.get(fmt, ())) or "none (not supported for csv)"
+        return jsonify({"error": f"compression for {fmt} must be one of: {allowed}"}), 400
     try:
-        file_content, filename = export_collection_range(collection, start_date, end_date)
-        file_content.seek(0)
-        return send_file(
-            file_content,
-            mimetype="text/csv",
-            as_attachment=True,
-            download_name=filename
+        if fmt == "csv":
+            chunks, filename = export_collection_range(collection, start_date, end_date, fields)
+            mimetype = "text/csv"
+        else:
+            chunks, filename = export_collection_columnar(collection, start_date, end_date, fmt, fields, compression)
+            mimetype = PARQUET_MIMETYPE if fmt == "parquet" else ARROW_MIMETYPE
+        # No Content-Length: the body goes out chunked as the cursor is read
+        return Response(
+            chunks,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except InvalidExportFields as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except FormatUnavailable as e:
+        return jsonify({"status": "error", "message": str(e)}), 406
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
     
@@ -0,0 +1,82 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls with the same key share one execution.
+    The first caller runs fn(); callers arriving while it is in flight wait for
+    its result (or exception) for at most `timeout` seconds.
+    """
+
+    def __init__(self, name, timeout=30.0):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self._stats["errors"] += 1
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"{self.name}: timed out waiting for in-flight call {key!r}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name, timeout=30.0):
+    """Process-wide SingleFlight group by name."""
+    group = _groups.get(name)
+    if group is None:
+        with _groups_lock:
+            group = _groups.setdefault(name, SingleFlight(name, timeout))
+    return group
+
+
+def all_stats():
+    return {name: group.stats() for name, group in list(_groups.items())}
@@ -0,0 +1,141 @@
+import os
+import io
+import csv
+import time
+import threading
+from types import MappingProxyType
+import pandas as pd
+
+os_stocks_file = os.getenv("STOCKS_LIST_FILE", "/shared/stocks_list.txt")
+
+# How often (seconds) the stocks file mtime is re-checked
+RELOAD_CHECK_SECONDS = 2.0
+
+
+def to_symbol(ticker):
+    """Ticker without the exchange suffix, e.g. RELIANCE.NS -> RELIANCE."""
+    return ticker.replace(".NS", "")
+
+
+class StockSnapshot:
+    """
+    Immutable view of stocks_list.txt.
+    - ids / tickers / symbols: parallel tuples in file order
+    - id_to_ticker, ticker_to_id, symbol_to_id: read-only indexes
+    """
+    __slots__ = ("exists", "mtime", "header", "rows", "ids", "tickers", "symbols",
+                 "id_to_ticker", "ticker_to_id", "symbol_to_id", "_dataframe")
+
+    def __init__(self, header=(), rows=(), exists=False, mtime=None):
+        self.exists = exists
+        self.mtime = mtime
+        self.header = tuple(header)
+        self.rows = tuple(tuple(r) for r in rows)
+
+        id_to_ticker = {}
+        for parts in self.rows:
+            if len(parts) < 3:
+                continue
+            try:
+                stock_id = int(parts[0].strip())
+            except ValueError:
+                continue
+            id_to_ticker[stock_id] = parts[2].strip()
+
+        self.ids = tuple(id_to_ticker.keys())
+        self.tickers = tuple(id_to_ticker.values())
+        self.symbols = tuple(to_symbol(t) for t in self.tickers)
+        self.id_to_ticker = MappingProxyType(id_to_ticker)
+        self.ticker_to_id = MappingProxyType({t: i for i, t in id_to_ticker.items()})
+        self.symbol_to_id = MappingProxyType({to_symbol(t): i for i, t in id_to_ticker.items()})
+        self._dataframe = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def dataframe(self):
+        """Full stock list as a DataFrame (a fresh copy, callers may mutate it)."""
+        if self._dataframe is None:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(self.header)
+            writer.writerows(self.rows)
+            buf.seek(0)
+            df = pd.read_csv(buf, na_values=['None', 'NULL', 'null', ''])
+            if 'ID' in df.columns:
+                df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
+            for col in ['End Datetime', 'Trained Datetime']:
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col], errors='coerce')
+            self._dataframe = df
+        return self._dataframe.copy()
+
+
+class StockRegistry:
+    """
+    Process-wide stock universe. stocks_list.txt is parsed once into a
+    StockSnapshot that is swapped atomically whenever the file mtime changes.
+    """
+
+    def __init__(self, stocks_file=os_stocks_file):
+        self.stocks_file = stocks_file
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_check = 0.0
+
+    def _load(self, mtime):
+        if mtime is None:
+            return StockSnapshot()
+        with open(self.stocks_file, "r", newline='') as f:
+            lines = [line for line in csv.reader(f) if line and any(p.strip() for p in line)]
+        header, rows = (), []
+        for parts in lines:
+            if parts[0].strip().lower().startswith("id"):
+                header = header or parts
+                continue
+            rows.append(parts)
+        return StockSnapshot(header, rows, exists=True, mtime=mtime)
+
+    def snapshot(self):
+        """Current StockSnapshot, reloading it if the file changed."""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._last_check < RELOAD_CHECK_SECONDS:
+            return snapshot
+        self._last_check = now
+        try:
+            mtime = os.stat(self.stocks_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if snapshot is not None and snapshot.mtime == mtime:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.mtime != mtime:
+                try:
+                    snapshot = self._load(mtime)
+                except FileNotFoundError:
+                    snapshot = StockSnapshot()
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """Drop the current snapshot so the next read re-parses the file."""
+        with self._lock:
+            self._snapshot = None
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_stock_registry(stocks_file=None):
+    """Process-wide StockRegistry for the given file (default: STOCKS_LIST_FILE)."""
+    # One registry per file however its path is spelled (relative, symlinked, ...)
+    stocks_file = os.path.realpath(stocks_file or os_stocks_file)
+    registry = _registries.get(stocks_file)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(stocks_file, StockRegistry(stocks_file))
+    return registry
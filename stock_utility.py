@@ -5,64 +5,50 @@ import time
 import datetime
 import pytz
 import socket
+from pymongo.errors import OperationFailure
 from mongo_client import non_flask_db as db
+from market_calendar import get_market_calendar
+from stock_registry import get_stock_registry
 
 IST = pytz.timezone("Asia/Kolkata")
 UTC = pytz.utc
 os_holiday_file = os.getenv("HOLIDAY_FILE", "/shared/holiday.txt")
 os_stocks_file = os.getenv("STOCKS_LIST_FILE", "/shared/stocks_list.txt")
 
+# Whether the server accepts $topN (MongoDB 5.2+); None until first tried
+_TOPN_SUPPORTED = None
+# Upper bound of daily bars in a year-to-date window
+YTD_MAX_BARS = 260
+# Trading days of intraday bars scanned by get_live_profit_snapshot to find each stock's latest session
+LIVE_LOOKBACK_TRADING_DAYS = 5
+
 class StockUtility:
     def __init__(self, stock_list_file=None):
         self.ist = pytz.timezone("Asia/Kolkata")
         self.stock_list_file = stock_list_file or os_stocks_file
-        self.stock_df = self.load_stock_list()
+
+    @property
+    def stock_df(self):
+        # Resolved lazily from the shared registry so instances don't each parse the CSV
+        return self.load_stock_list()
 
     def get_market_start_utc(self, dt):
         # Convert any datetime to start of the trading day in UTC
         return datetime.datetime.combine(dt.date(), datetime.time(3, 45))
     
     def is_market_closed(self, date, holiday_file=os_holiday_file):
-        # 1. Check weekend (Saturday=5, Sunday=6)
-        if date.weekday() >= 5:
-            return True
-
-        # 2. Check holidays
-        try:
-            with open(holiday_file, "r") as f:
-                holidays = {line.strip() for line in f if line.strip()}
-                if date.strftime("%Y-%m-%d") in holidays:
-                    return True
-        except FileNotFoundError:
-            print(f"[⚠️] Holiday file not found: {holiday_file}")
-
-        # Market is open
-        return False
+        # Weekend or holiday, answered from the in-memory trading calendar
+        return not get_market_calendar(holiday_file).is_trading_day(date)
 
     def get_last_trading_day(self, reference_date):
-        
-        #if reference_date:
-        #    reference_date -= datetime.timedelta(days=1)
-
-        while self.is_market_closed(reference_date):
-            reference_date -= datetime.timedelta(days=1)
-        return reference_date
+        # Step back to the closest trading day in one calendar lookup,
+        # keeping the caller's type (date / datetime) and time of day
+        last_day = get_market_calendar().last_trading_day(reference_date)
+        ref_day = reference_date.date() if isinstance(reference_date, datetime.datetime) else reference_date
+        return reference_date - datetime.timedelta(days=(ref_day - last_day).days)
 
     def is_market_day(self, date, holiday_file=os_holiday_file):
-        # Check if weekend
-        if date.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-            return False
-
-        # Check against holiday list
-        try:
-            with open(holiday_file, "r") as f:
-                holidays = {line.strip() for line in f if line.strip()}
-                if date.strftime("%Y-%m-%d") in holidays:
-                    return False
-        except FileNotFoundError:
-            print(f"[⚠️] Holiday file not found: {holiday_file}")
-        
-        return True
+        return get_market_calendar(holiday_file).is_trading_day(date)
     
     def is_market_live(self, date, holiday_file=os_holiday_file):
         """
@@ -80,21 +66,10 @@ class StockUtility:
                 date = ist.localize(date)
             now_ist = date.astimezone(ist)
 
-        today = now_ist.date()
-
-        # Weekend
-        if today.weekday() >= 5:
+        # Weekend / holiday
+        if not get_market_calendar(holiday_file).is_trading_day(now_ist.date()):
             return False
 
-        # Holiday
-        try:
-            with open(holiday_file, "r") as f:
-                holidays = {line.strip() for line in f if line.strip()}
-                if today.strftime("%Y-%m-%d") in holidays:
-                    return False
-        except FileNotFoundError:
-            print(f"[⚠️] Holiday file not found: {holiday_file}")
-
         # Time check
         market_start = datetime.time(9, 15)
         market_end = datetime.time(15, 30)
@@ -111,8 +86,9 @@ class StockUtility:
         now = datetime.datetime.now(ist)
         market_open_time = datetime.time(9, 15)
         market_close_time = datetime.time(15, 30)
+        calendar = get_market_calendar()
         # If today is a trading day,
-        if self.is_market_day(now.date()):
+        if calendar.is_trading_day(now.date()):
             # If now is BEFORE market open today
             if now.time() < market_open_time:
                 # next open is today at 9:15
@@ -125,9 +101,7 @@ class StockUtility:
             # Will fall through to next day logic
 
         # Otherwise, find next valid trading day
-        next_day = now.date() + datetime.timedelta(days=1)
-        while not self.is_market_day(next_day):
-            next_day += datetime.timedelta(days=1)
+        next_day = calendar.next_trading_day(now.date())
         return ist.localize(datetime.datetime.combine(next_day, market_open_time))
 
     def get_live_profit_status(self, stock_id, ticker):
@@ -178,6 +152,79 @@ class StockUtility:
         except Exception as e:
             print(f"[❌] Error in get_live_profit_status: {e}")
             return None
+
+    def get_live_profit_snapshot(self, stock_ids):
+        """
+        Universe-wide version of get_live_profit_status in one aggregation over `intraday`.
+
+        Parameters:
+            stock_ids (Iterable[int] | Mapping[int, str]): stock ids, or a stock_id -> ticker
+                mapping (tickers are otherwise taken from the stock list).
+
+        Returns:
+            dict: {stock_id: {"ticker", "datetime", "open", "price", "volume", "change", "profit"}}
+                for stocks with bars in the last LIVE_LOOKBACK_TRADING_DAYS trading days.
+        """
+        if hasattr(stock_ids, "items"):
+            stocks = {int(sid): ticker for sid, ticker in stock_ids.items()}
+        else:
+            id_to_ticker = get_stock_registry(self.stock_list_file).snapshot().id_to_ticker
+            stocks = {int(sid): id_to_ticker[int(sid)] for sid in stock_ids if int(sid) in id_to_ticker}
+        if not stocks:
+            return {}
+
+        today = datetime.datetime.now(IST).date()
+        first_day = get_market_calendar().nth_trading_day_before(today, LIVE_LOOKBACK_TRADING_DAYS)
+        since = IST.localize(datetime.datetime.combine(first_day, datetime.time.min)).astimezone(UTC).replace(tzinfo=None)
+
+        bar = {"t": "$Datetime", "o": "$Open", "c": "$Close", "v": "$Volume"}
+        pipeline = [
+            {"$match": {
+                "stock_id": {"$in": list(stocks.keys())},
+                "ticker": {"$in": list(set(stocks.values()))},
+                "Datetime": {"$gte": since}
+            }},
+            {"$sort": {"stock_id": 1, "ticker": 1, "Datetime": 1}},
+            # First and last bar of every IST session
+            {"$group": {
+                "_id": {
+                    "stock_id": "$stock_id",
+                    "ticker": "$ticker",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$Datetime", "timezone": "Asia/Kolkata"}}
+                },
+                "first": {"$first": bar},
+                "last": {"$last": bar}
+            }},
+            # Keep the newest session per stock
+            {"$sort": {"_id.day": -1}},
+            {"$group": {
+                "_id": {"stock_id": "$_id.stock_id", "ticker": "$_id.ticker"},
+                "first": {"$first": "$first"},
+                "last": {"$first": "$last"}
+            }}
+        ]
+
+        result = {}
+        for row in db["intraday"].aggregate(pipeline, allowDiskUse=True):
+            stock_id, ticker = row["_id"]["stock_id"], row["_id"]["ticker"]
+            if stocks.get(stock_id) != ticker:
+                continue
+            # Same prices get_live_profit_status uses
+            open_price = row["first"].get("c") or row["first"].get("o")
+            last_price, last_volume = row["last"].get("c"), row["last"].get("v")
+            if not open_price or not last_price:
+                continue
+            profit_amount = round(last_price - open_price, 2)
+            result[stock_id] = {
+                "ticker": ticker,
+                "datetime": row["last"].get("t"),
+                "open": round(open_price, 2),
+                "price": round(last_price, 2),
+                "volume": int(last_volume or 0),
+                "change": round((profit_amount / open_price) * 100, 2),
+                "profit": profit_amount
+            }
+        return result
         
     def get_intraday_profit(self, stock_id, ticker, target_datetime):
         """
@@ -301,6 +348,114 @@ class StockUtility:
             print(f"[❌] Error computing periodic profit: {e}")
             return None
 
+    def _window_profit_expr(self, n, since=None):
+        """
+        Aggregation expression: {percent, amount} over the newest n valid bars of $bars
+        (or the bars at/after `since`), or null when there are too few bars.
+        """
+        bars = {"$slice": ["$bars", n]} if since is None else {
+            "$filter": {"input": "$bars", "as": "b", "cond": {"$gte": ["$$b.t", since]}}
+        }
+        window = {"$filter": {
+            "input": bars,
+            "as": "b",
+            # Same rows get_periodic_profit keeps after dropna(): numeric, non-NaN Open and Close
+            "cond": {"$and": [
+                {"$isNumber": "$$b.o"}, {"$gt": ["$$b.o", float("-inf")]},
+                {"$isNumber": "$$b.c"}, {"$gt": ["$$b.c", float("-inf")]}
+            ]}
+        }}
+        # A 1-bar window is that day's Open -> Close; longer windows need at least 2 bars
+        min_bars = 1 if n == 1 else 2
+        return {"$let": {
+            "vars": {"w": window},
+            "in": {"$cond": [
+                {"$lt": [{"$size": "$$w"}, min_bars]},
+                None,
+                {"$let": {
+                    "vars": {"first": {"$arrayElemAt": ["$$w", -1]}, "last": {"$arrayElemAt": ["$$w", 0]}},
+                    "in": {"$cond": [
+                        {"$eq": ["$$first.o", 0]},
+                        None,
+                        {
+                            "percent": {"$round": [{"$multiply": [
+                                {"$divide": [{"$subtract": ["$$last.c", "$$first.o"]}, "$$first.o"]}, 100
+                            ]}, 2]},
+                            "amount": {"$round": [{"$subtract": ["$$last.c", "$$first.o"]}, 2]}
+                        }
+                    ]}
+                }}
+            ]}
+        }}
+
+    def get_periodic_profits(self, stocks, windows=(7, 30)):
+        """
+        Universe-wide version of get_periodic_profit in one aggregation over `historical`.
+
+        Parameters:
+            stocks (Mapping[int, str]): stock_id -> ticker.
+            windows (tuple): window sizes in daily bars, or "ytd" for bars since Jan 1 (IST).
+
+        Returns:
+            dict: {(stock_id, ticker): {window: {"percent": float, "amount": float} or None}}
+        """
+        global _TOPN_SUPPORTED
+        if not stocks:
+            return {}
+        bar_windows = [w for w in windows if w != "ytd"]
+        max_n = max(bar_windows + ([YTD_MAX_BARS] if "ytd" in windows else []))
+        year_start = IST.localize(datetime.datetime(datetime.datetime.now(IST).year, 1, 1)).astimezone(UTC).replace(tzinfo=None)
+
+        match = {"$match": {
+            "stock_id": {"$in": [int(sid) for sid in stocks.keys()]},
+            "ticker": {"$in": list(stocks.values())}
+        }}
+        project = {"$project": {
+            str(w): self._window_profit_expr(w, since=year_start) if w == "ytd" else self._window_profit_expr(w)
+            for w in windows
+        }}
+        bar_fields = {"o": "$Open", "c": "$Close", "t": "$Datetime"}
+
+        # $topN keeps only the newest max_n bars per stock inside $group (MongoDB 5.2+)
+        topn_pipeline = [
+            match,
+            {"$group": {
+                "_id": {"stock_id": "$stock_id", "ticker": "$ticker"},
+                "bars": {"$topN": {"n": max_n, "sortBy": {"Datetime": -1}, "output": bar_fields}}
+            }},
+            project
+        ]
+        # Older servers: sort, push and slice
+        push_pipeline = [
+            match,
+            {"$sort": {"stock_id": 1, "ticker": 1, "Datetime": -1}},
+            {"$group": {
+                "_id": {"stock_id": "$stock_id", "ticker": "$ticker"},
+                "bars": {"$push": bar_fields}
+            }},
+            {"$project": {"bars": {"$slice": ["$bars", max_n]}}},
+            project
+        ]
+
+        rows = None
+        if _TOPN_SUPPORTED is not False:
+            try:
+                rows = list(db["historical"].aggregate(topn_pipeline))
+                _TOPN_SUPPORTED = True
+            except OperationFailure as e:
+                print(f"[⚠️] $topN unavailable, falling back to $push/$slice: {e}")
+                _TOPN_SUPPORTED = False
+        if rows is None:
+            rows = list(db["historical"].aggregate(push_pipeline, allowDiskUse=True))
+
+        result = {}
+        for row in rows:
+            stock_id, ticker = row["_id"]["stock_id"], row["_id"]["ticker"]
+            if stocks.get(stock_id) != ticker:
+                continue
+            result[(stock_id, ticker)] = {w: row.get(str(w)) for w in windows}
+        return result
+
     def get_intraday_summary(self, stock_id, ticker, date=None):
         try:
             if date is None:
@@ -345,47 +500,26 @@ class StockUtility:
             print(f"[❌] Error computing intraday summary: {e}")
             return None
 
-    def load_stock_list_as_symbols(self, file_path="/shared/stocks_list.txt"):
+    def load_stock_list_as_symbols(self, file_path=None):
         """
-        Load stock symbols (ticker) from stocks_list.txt and return as a list of symbols.
-        Assumes ticker is in the 3rd column (index 2), based on previous info,
-        skipping header lines and ignoring empty lines.
+        Return the stock symbols (ticker, 3rd column) from stocks_list.txt.
+        Served from the shared StockRegistry snapshot instead of re-reading the file.
         """
-        try:
-            with open(file_path, "r") as f:
-                # Skip lines starting with 'id' (case insensitive) and empty lines
-                lines = [line.strip() for line in f if line.strip() and not line.lower().startswith("id")]
-                # Extract 3rd column (ticker) if line contains at least 3 columns
-                symbols = [line.split(",")[2].strip() for line in lines if len(line.split(",")) >= 3]
-            return symbols
-        except FileNotFoundError:
+        snapshot = get_stock_registry(file_path or self.stock_list_file).snapshot()
+        if not snapshot.exists:
             raise FileNotFoundError("stocks_list.txt not found")
-        except Exception as e:
-            raise Exception(f"Error loading stock list: {str(e)}")
+        return list(snapshot.tickers)
 
     def load_stock_list_as_dataframe(self):
         """
-        Load stock list from stocks_list.txt and return as a pandas DataFrame.
-        Properly reads all columns based on CSV header.
+        Return the stock list from stocks_list.txt as a pandas DataFrame.
+        Built once per StockRegistry snapshot; each call gets its own copy.
         """
-        
-        try:
-            # Use pandas CSV reader with proper NA handling for 'None' string
-            df = pd.read_csv(os_stocks_file, na_values=['None', 'NULL', 'null', ''])
-            
-            # Optionally convert 'ID' column to integer
-            if 'ID' in df.columns:
-                df['ID'] = pd.to_numeric(df['ID'], errors='coerce').fillna(0).astype(int)
-            
-            # Parse datetime columns if present
-            datetime_cols = ['End Datetime', 'Trained Datetime']
-            for col in datetime_cols:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-            return df
-        except FileNotFoundError:
+        snapshot = get_stock_registry(self.stock_list_file).snapshot()
+        if not snapshot.exists:
             raise FileNotFoundError("stocks_list.txt not found")
+        try:
+            return snapshot.dataframe()
         except Exception as e:
             raise Exception(f"Error loading stock list: {str(e)}")
 
@@ -444,10 +578,11 @@ class StockUtility:
 
 if __name__ == "__main__":
     util = StockUtility(os_stocks_file)
+    live_profits = util.get_live_profit_snapshot(get_stock_registry(os_stocks_file).snapshot().id_to_ticker)
     for _, row in util.stock_df.iterrows():
         stock_id = row['ID']
         ticker = row['Ticker']
         print(ticker)
-        print("Live Profit:", util.get_live_profit_status(stock_id, ticker))
+        print("Live Profit:", live_profits.get(int(stock_id)))
         print("Last 7 Days Profit:", util.get_weekly_profit_status(stock_id, ticker))
         print("Last 30 Days Profit:", util.get_periodic_profit(stock_id, ticker))
@@ -0,0 +1,41 @@
+import datetime
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import response_formats
+
+
+def test_int_sample_stays_int64():
+    records = [{"Volume": 1200} for _ in range(500)]
+    schema = response_formats.arrow_schema(records, ["Volume"])
+    assert schema.field("Volume").type == pa.int64()
+    batch = response_formats.arrow_record_batch(records + [{"Volume": 2 ** 53 + 1}], schema)
+    assert batch.column(0).to_pylist()[-1] == 2 ** 53 + 1
+
+
+def test_mixed_int_float_sample_widens_to_float64():
+    sample = [{"Close": 100}, {"Close": 100.75}]
+    schema = response_formats.arrow_schema(sample, ["Close"])
+    assert schema.field("Close").type == pa.float64()
+    batch = response_formats.arrow_record_batch([{"Close": 101}, {"Close": 99.5}], schema)
+    assert batch.column(0).to_pylist() == [101.0, 99.5]
+
+
+def test_fraction_after_int_sample_fails_the_batch():
+    schema = response_formats.arrow_schema([{"Close": 100}], ["Close"])
+    with pytest.raises(ValueError, match="Close"):
+        response_formats.arrow_record_batch([{"Close": 100}, {"Close": 100.75}], schema)
+
+
+def test_value_outside_sampled_type_fails_the_batch():
+    sample = [{"Datetime": datetime.datetime(2025, 1, 6, 9, 15)}]
+    schema = response_formats.arrow_schema(sample, ["Datetime"])
+    with pytest.raises(ValueError, match="Datetime"):
+        response_formats.arrow_record_batch(sample + [{"Datetime": "n/a"}], schema)
+
+
+def test_all_null_sample_column_becomes_string():
+    schema = response_formats.arrow_schema([{"note": None}], ["note"])
+    assert schema.field("note").type == pa.string()
+    batch = response_formats.arrow_record_batch([{"note": None}, {"note": "x"}], schema)
+    assert batch.column(0).to_pylist() == [None, "x"]
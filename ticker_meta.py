@@ -0,0 +1,162 @@
+import time
+import datetime
+import threading
+from collections import OrderedDict
+import yfinance as yf
+from pymongo import ASCENDING
+from mongo_client import non_flask_db as db
+import index_manager
+from ohlcv_cache import upstream
+
+META_COLLECTION = "ticker_meta"
+
+POSITIVE_TTL = datetime.timedelta(hours=24)
+NEGATIVE_TTL = datetime.timedelta(minutes=10)
+LRU_MAX_ENTRIES = 1024
+
+# Background refresher: wake-up interval, look-ahead window and batch size
+REFRESH_INTERVAL_SECONDS = 600
+REFRESH_AHEAD = datetime.timedelta(hours=1)
+REFRESH_BATCH = 50
+
+# yfinance .info keys kept in the cache
+META_FIELDS = {
+    "longName": "name",
+    "shortName": "short_name",
+    "sector": "sector",
+    "industry": "industry",
+    "exchange": "exchange",
+    "currency": "currency",
+    "quoteType": "quote_type",
+    "regularMarketPrice": "regularMarketPrice",
+    "previousClose": "previousClose",
+    "marketCap": "marketCap",
+}
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+_indexes_ready = False
+_refresher = None
+
+
+def _normalize(ticker):
+    return ticker.strip().upper()
+
+
+def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    try:
+        # Declared in index_manager.INDEX_SPECS
+        index_manager.ensure_indexes(META_COLLECTION)
+        _indexes_ready = True
+    except Exception as e:
+        print(f"[⚠️] Could not create {META_COLLECTION} indexes: {e}")
+
+
+def _lru_get(ticker):
+    with _lru_lock:
+        entry = _lru.get(ticker)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= datetime.datetime.utcnow():
+            _lru.pop(ticker, None)
+            return None
+        _lru.move_to_end(ticker)
+        return entry
+
+
+def _lru_put(entry):
+    with _lru_lock:
+        _lru[entry["ticker"]] = entry
+        _lru.move_to_end(entry["ticker"])
+        while len(_lru) > LRU_MAX_ENTRIES:
+            _lru.popitem(last=False)
+
+
+def _fetch_info(ticker):
+    """Fetch .info upstream (coalesced) and build the cache entry."""
+    info = upstream.do(("info", ticker), lambda: yf.Ticker(ticker).info)
+    now = datetime.datetime.utcnow()
+    valid = bool(info) and "regularMarketPrice" in info
+    meta = {name: info.get(key) for key, name in META_FIELDS.items()} if valid else None
+    if meta is not None and not meta.get("name"):
+        meta["name"] = meta.get("short_name")
+    return {
+        "ticker": ticker,
+        "valid": valid,
+        "meta": meta,
+        "fetched_at": now,
+        "expires_at": now + (POSITIVE_TTL if valid else NEGATIVE_TTL),
+    }
+
+
+def _store(entry):
+    _ensure_indexes()
+    try:
+        db[META_COLLECTION].update_one({"ticker": entry["ticker"]}, {"$set": entry}, upsert=True)
+    except Exception as e:
+        print(f"[⚠️] Could not store ticker meta for {entry['ticker']}: {e}")
+    _lru_put(entry)
+
+
+def get_ticker_meta_entry(ticker):
+    """
+    Cached metadata entry for a ticker: {"ticker", "valid", "meta", "fetched_at", "expires_at"}.
+    Lookup order: in-process LRU -> Mongo -> yfinance. Upstream errors are raised, not cached.
+    """
+    ticker = _normalize(ticker)
+    entry = _lru_get(ticker)
+    if entry is not None:
+        return entry
+
+    doc = db[META_COLLECTION].find_one({"ticker": ticker}, {"_id": 0})
+    if doc and doc.get("expires_at") and doc["expires_at"] > datetime.datetime.utcnow():
+        _lru_put(doc)
+        return doc
+
+    entry = _fetch_info(ticker)
+    _store(entry)
+    return entry
+
+
+def get_ticker_meta(ticker):
+    """Metadata dict for a valid ticker, None if the ticker does not exist."""
+    entry = get_ticker_meta_entry(ticker)
+    return entry["meta"] if entry.get("valid") else None
+
+
+def refresh_expiring(limit=REFRESH_BATCH):
+    """Re-fetch positive entries that expire within REFRESH_AHEAD. Returns the number refreshed."""
+    horizon = datetime.datetime.utcnow() + REFRESH_AHEAD
+    docs = db[META_COLLECTION].find(
+        {"valid": True, "expires_at": {"$lte": horizon}},
+        {"ticker": 1, "_id": 0}
+    ).sort("expires_at", ASCENDING).limit(limit)
+    refreshed = 0
+    for doc in docs:
+        try:
+            _store(_fetch_info(doc["ticker"]))
+            refreshed += 1
+        except Exception as e:
+            print(f"[⚠️] Ticker meta refresh failed for {doc['ticker']}: {e}")
+    return refreshed
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_INTERVAL_SECONDS)
+        try:
+            refresh_expiring()
+        except Exception as e:
+            print(f"[❌] Ticker meta refresher error: {e}")
+
+
+def start_refresher():
+    """Start the background refresher thread (once per process)."""
+    global _refresher
+    if _refresher is None or not _refresher.is_alive():
+        _refresher = threading.Thread(target=_refresh_loop, name="ticker-meta-refresher", daemon=True)
+        _refresher.start()
+    return _refresher
@@ -0,0 +1,210 @@
+import time
+import datetime
+import threading
+import pytz
+from mongo_client import non_flask_db as db
+from stock_utility import StockUtility
+from stock_registry import get_stock_registry
+
+IST = pytz.timezone("Asia/Kolkata")
+
+SNAPSHOT_COLLECTION = "top_gainers_snapshot"
+SNAPSHOT_ID = "top_gainers"
+
+# Window name -> get_periodic_profits window (daily bars, or "ytd")
+WINDOWS = {"1d": 1, "7d": 7, "30d": 30, "90d": 90, "ytd": "ytd"}
+DEFAULT_WINDOW = "7d"
+
+# How often (seconds) `historical` is polled for new or updated daily bars
+POLL_INTERVAL_SECONDS = 60
+# Bars dated within this many days of the last full build are re-checked on every poll
+RECHECK_DAYS = 7
+# Full rebuild interval (seconds), catching corrections to bars older than the re-check window
+FULL_RESYNC_SECONDS = 3600
+
+stock_util = StockUtility()
+stock_registry = get_stock_registry()
+
+_lock = threading.Lock()
+_state = {"stocks": None, "year": None, "fingerprints": None, "recheck_from": None, "synced_at": None,
+          "version": 0, "universe_mtime": None}
+_sorted_cache = {}
+_maintainer = None
+
+
+def _build_entries(stocks):
+    """Per-stock snapshot entries for the given stock_id -> ticker mapping."""
+    profits = stock_util.get_periodic_profits(stocks, windows=tuple(WINDOWS.values()))
+    entries = {}
+    for (stock_id, ticker), windows in profits.items():
+        entry = {"stock": ticker.replace(".NS", ""), "stock_id": stock_id, "ticker": ticker}
+        for name, window in WINDOWS.items():
+            profit = windows.get(window)
+            entry[f"{name}_percent"] = profit["percent"] if profit else None
+            entry[f"{name}_profit"] = profit["amount"] if profit else None
+        entries[str(stock_id)] = entry
+    return entries
+
+
+def _finite_or_zero(field):
+    # NaN (and null) sort below -Infinity, so they count as 0; one NaN bar would make the sum NaN != NaN
+    return {"$cond": [{"$gt": [field, float("-inf")]}, field, 0]}
+
+
+def recent_fingerprints(recheck_from):
+    """
+    {str(stock_id): [bars, newest Datetime, sum of Close, sum of Volume]} over the daily
+    bars dated from recheck_from on. Any inserted, deleted or rewritten bar in that range
+    changes its stock's fingerprint, whatever its _id.
+    """
+    rows = db["historical"].aggregate([
+        {"$match": {"Datetime": {"$gte": recheck_from}}},
+        {"$group": {"_id": "$stock_id", "bars": {"$sum": 1}, "last": {"$max": "$Datetime"},
+                    "close": {"$sum": _finite_or_zero("$Close")}, "volume": {"$sum": _finite_or_zero("$Volume")}}}
+    ])
+    return {
+        str(row["_id"]): [row["bars"], row["last"], round(row["close"] or 0, 6), round(row["volume"] or 0, 6)]
+        for row in rows if row["_id"] is not None
+    }
+
+
+def _publish(stocks, year, fingerprints, recheck_from, synced_at):
+    with _lock:
+        _state.update({"stocks": stocks, "year": year, "fingerprints": fingerprints, "recheck_from": recheck_from,
+                       "synced_at": synced_at, "version": _state["version"] + 1})
+        _sorted_cache.clear()
+
+
+def rebuild_all():
+    """Recompute every stock and persist the snapshot document."""
+    synced_at = datetime.datetime.utcnow()
+    recheck_from = synced_at - datetime.timedelta(days=RECHECK_DAYS)
+    # Fingerprints first: bars changing during the build are picked up by the next poll
+    fingerprints = recent_fingerprints(recheck_from)
+    year = datetime.datetime.now(IST).year
+    universe = stock_registry.snapshot()
+    stocks = _build_entries(universe.id_to_ticker)
+    _state["universe_mtime"] = universe.mtime
+    db[SNAPSHOT_COLLECTION].replace_one(
+        {"_id": SNAPSHOT_ID},
+        {"_id": SNAPSHOT_ID, "stocks": stocks, "year": year, "fingerprints": fingerprints,
+         "recheck_from": recheck_from, "synced_at": synced_at, "updated_at": synced_at},
+        upsert=True
+    )
+    _publish(stocks, year, fingerprints, recheck_from, synced_at)
+    return stocks
+
+
+def update_stocks(stock_ids):
+    """Recompute only the given stocks and patch them into the snapshot."""
+    id_to_ticker = stock_registry.snapshot().id_to_ticker
+    subset = {sid: id_to_ticker[sid] for sid in stock_ids if sid in id_to_ticker}
+    if not subset:
+        return {}
+    entries = _build_entries(subset)
+    if entries:
+        db[SNAPSHOT_COLLECTION].update_one(
+            {"_id": SNAPSHOT_ID},
+            {"$set": {**{f"stocks.{sid}": entry for sid, entry in entries.items()},
+                      "updated_at": datetime.datetime.utcnow()}}
+        )
+        with _lock:
+            stocks = dict(_state["stocks"] or {})
+        stocks.update(entries)
+        _publish(stocks, _state["year"], _state["fingerprints"], _state["recheck_from"], _state["synced_at"])
+    return entries
+
+
+def poll_new_bars():
+    """
+    Recompute only the stocks whose recent daily bars (dated within the re-check window)
+    were inserted, updated or deleted since the last poll, detected by fingerprint.
+    Rebuilds everything every FULL_RESYNC_SECONDS. Returns the updated stock_ids.
+    """
+    fingerprints = _state["fingerprints"]
+    if fingerprints is None:
+        rebuild_all()
+        return []
+    if _state["year"] != datetime.datetime.now(IST).year:
+        # Year-to-date windows restart on Jan 1
+        rebuild_all()
+        return []
+    if (datetime.datetime.utcnow() - _state["synced_at"]).total_seconds() >= FULL_RESYNC_SECONDS:
+        rebuild_all()
+        return []
+
+    # Stocks added to stocks_list.txt since the last build
+    universe = stock_registry.snapshot()
+    if universe.mtime != _state["universe_mtime"]:
+        missing = [sid for sid in universe.ids if str(sid) not in (_state["stocks"] or {})]
+        update_stocks(missing)
+        _state["universe_mtime"] = universe.mtime
+
+    current = recent_fingerprints(_state["recheck_from"])
+    changed = [sid for sid in set(current) | set(fingerprints) if current.get(sid) != fingerprints.get(sid)]
+    if not changed:
+        return []
+    stock_ids = [int(sid) for sid in changed]
+    update_stocks(stock_ids)
+    db[SNAPSHOT_COLLECTION].update_one({"_id": SNAPSHOT_ID}, {"$set": {"fingerprints": current}})
+    with _lock:
+        _state["fingerprints"] = current
+    return stock_ids
+
+
+def load():
+    """Load the persisted snapshot into memory, building it when missing."""
+    doc = db[SNAPSHOT_COLLECTION].find_one({"_id": SNAPSHOT_ID})
+    if (not doc or doc.get("year") != datetime.datetime.now(IST).year or doc.get("fingerprints") is None
+            or (datetime.datetime.utcnow() - doc["synced_at"]).total_seconds() >= FULL_RESYNC_SECONDS):
+        return rebuild_all()
+    _publish(doc.get("stocks") or {}, doc.get("year"), doc["fingerprints"], doc["recheck_from"], doc["synced_at"])
+    return _state["stocks"]
+
+
+def get_sorted(window=DEFAULT_WINDOW):
+    """
+    Snapshot entries sorted by `window` (descending, missing values last),
+    restricted to the current stock universe. Sorted once per snapshot version.
+    """
+    if _state["stocks"] is None:
+        with _lock:
+            needs_load = _state["stocks"] is None
+        if needs_load:
+            load()
+    universe = stock_registry.snapshot()
+    key = (window, _state["version"], universe)
+    cached = _sorted_cache.get(key)
+    if cached is not None:
+        return cached
+
+    field = f"{window}_percent"
+    entries = [
+        entry for sid, entry in (_state["stocks"] or {}).items()
+        if universe.id_to_ticker.get(int(sid)) == entry.get("ticker")
+        and any(entry.get(f"{name}_percent") is not None for name in WINDOWS)
+    ]
+    entries.sort(key=lambda x: (x[field] if x[field] is not None else -999), reverse=True)
+    with _lock:
+        _sorted_cache[key] = entries
+    return entries
+
+
+def _maintain_loop():
+    while True:
+        try:
+            if _state["stocks"] is None:
+                load()
+            poll_new_bars()
+        except Exception as e:
+            print(f"[❌] top_gainers_snapshot maintainer error: {e}")
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def start_maintainer():
+    """Start the background thread keeping the snapshot current (once per process)."""
+    global _maintainer
+    if _maintainer is None or not _maintainer.is_alive():
+        _maintainer = threading.Thread(target=_maintain_loop, name="top-gainers-snapshot", daemon=True)
+        _maintainer.start()
+    return _maintainer